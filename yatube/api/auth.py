@@ -0,0 +1,75 @@
+"""Аутентификация запросов API.
+
+Клиент API получает токен запросом ``POST /api/v1/token/`` с JSON
+``{"username": ..., "password": ...}`` и передаёт его в заголовке
+``Authorization: Token <ключ>``. Такие запросы не зависят от cookie,
+поэтому CSRF-токен для них не нужен. ``DELETE /api/v1/token/`` с тем же
+заголовком отзывает токен.
+
+Запросы без заголовка аутентифицируются сессией сайта, как в браузере;
+изменяющие запросы с сессией проходят проверку CSRF (заголовок
+``X-CSRFToken`` со значением cookie ``csrftoken``), и отказ приходит
+ответом JSON 403, а не HTML-страницей.
+"""
+from functools import wraps
+from http import HTTPStatus
+
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import Token
+
+KEYWORD = 'Token'
+
+
+class CsrfCheck(CsrfViewMiddleware):
+    """Проверка CSRF, которая возвращает причину отказа вместо ответа."""
+
+    def _reject(self, request, reason):
+        return reason
+
+
+def token_key(request):
+    """Ключ из заголовка ``Authorization`` или ``None`` без заголовка."""
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if not header or header[0] != KEYWORD:
+        return None
+    return header[1] if len(header) == 2 else ''
+
+
+def csrf_failure(request):
+    """Причина отказа CSRF для запроса с сессией или ``None``."""
+    check = CsrfCheck()
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+def api_auth(error):
+    """Аутентифицирует запрос токеном или сессией.
+
+    Представление освобождено от ``CsrfViewMiddleware``: проверку для
+    запросов с сессией делает сама обёртка. ``error(detail, status)``
+    строит ответ об ошибке.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = token_key(request)
+            if key is not None:
+                token = Token.objects.select_related('user').filter(
+                    key=key, user__is_active=True).first()
+                if token is None:
+                    return error('Неверный токен.', HTTPStatus.UNAUTHORIZED)
+                request.user = token.user
+                request.auth = token
+            else:
+                request.auth = None
+                if request.user.is_authenticated:
+                    reason = csrf_failure(request)
+                    if reason:
+                        return error(f'Ошибка CSRF: {reason}',
+                                     HTTPStatus.FORBIDDEN)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,70 @@
+"""Скорость сериализации постов для API.
+
+Сравнивает три способа собрать одинаковые словари ответа:
+``model_to_dict`` по экземплярам без ``select_related`` (автор и
+группа — отдельный запрос на каждый пост), те же экземпляры с
+``select_related`` и путь API через ``.values()``.
+"""
+import json
+import time
+
+from django.db import connection, reset_queries
+from django.forms.models import model_to_dict
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Post
+
+from .serializers import POSTS, isoformat, media_url
+
+
+def model_row(post):
+    row = model_to_dict(post, fields=('text',))
+    row.update(
+        id=post.pk,
+        pub_date=isoformat(post.pub_date),
+        author=post.author.username,
+        group=post.group.slug if post.group_id else None,
+        image=media_url(post.image.name),
+        comments_count=post.comments_count,
+    )
+    return row
+
+
+def naive(limit):
+    return [model_row(post) for post in Post.objects.all()[:limit]]
+
+
+def related(limit):
+    return [model_row(post) for post in
+            Post.objects.select_related('author', 'group')[:limit]]
+
+
+def values(limit):
+    return POSTS.rows(Post.objects.all()[:limit], list(POSTS.fields))
+
+
+WAYS = {'naive': naive, 'select_related': related, 'values': values}
+
+
+def throughput(limit=1000, repeat=5):
+    """Лучшее из ``repeat`` время каждого способа, число запросов и
+    строк в секунду, включая ``json.dumps`` результата."""
+    results = {}
+    for name, serialize in WAYS.items():
+        best = None
+        for _ in range(repeat):
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                rows = serialize(limit)
+                json.dumps(rows, ensure_ascii=False)
+                elapsed = time.perf_counter() - started
+            if best is None or elapsed < best:
+                best = elapsed
+        results[name] = {
+            'rows': len(rows),
+            'queries': len(queries),
+            'ms': round(best * 1000, 2),
+            'rows_per_second': round(len(rows) / best) if best else None,
+        }
+    return results
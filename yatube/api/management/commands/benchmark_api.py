@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api import benchmark as api_benchmark
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость сериализации постов API через .values() '
+            'с model_to_dict на синтетических данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--limit', type=int, default=1000,
+            help='Сколько постов сериализуется за один замер.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--json', action='store_true', help='Вывести результат в JSON.')
+
+    def handle(self, *args, **options):
+        with benchmark.throwaway_database():
+            benchmark.seed(options['posts'], options['users'])
+            results = api_benchmark.throughput(
+                options['limit'], options['repeat'])
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                '{name}: {rows} постов за {ms} мс, {rows_per_second} в '
+                'секунду, запросов {queries}'.format(name=name, **result))
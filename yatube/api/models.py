@@ -0,0 +1,30 @@
+import secrets
+
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class Token(models.Model):
+    """Токен клиента API, заменяет сессию и CSRF-токен."""
+    key = models.CharField('Ключ', max_length=40, primary_key=True)
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='api_token',
+        verbose_name='Пользователь',
+    )
+    created = models.DateTimeField('Дата выдачи', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Токен API'
+        verbose_name_plural = 'Токены API'
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = secrets.token_hex(20)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f'Токен {self.user}'
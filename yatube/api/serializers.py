@@ -0,0 +1,79 @@
+"""Сериализация ответов API из словарей ``.values()``.
+
+Поле ответа — выражение для ``values()`` (переходы по связям через
+``__`` база соединяет сама, без ``select_related`` и экземпляров
+моделей) и, если нужно, преобразование значения. ``?fields=``
+выбирает часть полей: в SELECT попадают только они и ключ сортировки
+курсора.
+"""
+from django.core.files.storage import default_storage
+
+
+def isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def media_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Serializer:
+    def __init__(self, fields, convert=None):
+        self.fields = fields
+        self.convert = convert or {}
+
+    def select(self, requested=None):
+        """Имена полей из ``?fields=``; неизвестные пропускаются."""
+        names = [
+            name for name in (requested or '').split(',')
+            if name in self.fields
+        ]
+        return names or list(self.fields)
+
+    def values(self, queryset, names, keys=()):
+        """``queryset.values()`` с полями ``names`` и ключами ``keys``."""
+        lookups = {self.fields[name] for name in names} | set(keys)
+        return queryset.values(*lookups)
+
+    def row(self, row, names):
+        result = {}
+        for name in names:
+            value = row[self.fields[name]]
+            convert = self.convert.get(name)
+            result[name] = convert(value) if convert else value
+        return result
+
+    def rows(self, queryset, names):
+        return [self.row(row, names)
+                for row in self.values(queryset, names)]
+
+
+POSTS = Serializer(
+    {
+        'id': 'pk',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+        'comments_count': 'comments_count',
+    },
+    convert={'pub_date': isoformat, 'image': media_url},
+)
+COMMENTS = Serializer(
+    {
+        'id': 'pk',
+        'post': 'post_id',
+        'text': 'text',
+        'author': 'author__username',
+        'pub_date': 'pub_date',
+    },
+    convert={'pub_date': isoformat},
+)
+GROUPS = Serializer({
+    'id': 'pk',
+    'title': 'title',
+    'slug': 'slug',
+    'description': 'description',
+    'posts_count': 'posts_count',
+})
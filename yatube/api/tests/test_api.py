@@ -0,0 +1,179 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+from .. import benchmark
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание')
+        for number in range(5):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author,
+                group=cls.group if number % 2 else None)
+        cls.post = Post.objects.latest('pk')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def send(self, client, method, url, data):
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json')
+
+    def test_cursor_pages_and_sparse_fields(self):
+        """Лента листается курсором, ?fields= оставляет только поля."""
+        url = reverse('api:posts')
+        with override_settings(API_PAGE_SIZE=3), self.assertNumQueries(1):
+            first = self.client.get(url, {'fields': 'id,text'}).json()
+        self.assertEqual(len(first['results']), 3)
+        self.assertEqual(set(first['results'][0]), {'id', 'text'})
+        self.assertEqual(first['results'][0]['text'], 'Пост 4')
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['text'] for row in second['results']],
+                         ['Пост 1', 'Пост 0'])
+        self.assertIsNone(second['next'])
+        self.assertEqual(set(second['results'][0]), {'id', 'text'})
+        response = self.client.get(url, {'cursor': 'битый'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_feeds(self):
+        """Ленты группы, автора и подписок."""
+        group = self.client.get(
+            reverse('api:group_posts', args=[self.group.slug])).json()
+        self.assertEqual(len(group['results']), 2)
+        self.assertEqual(group['results'][0]['group'], self.group.slug)
+        profile = self.client.get(
+            reverse('api:profile_posts', args=[self.author.username])).json()
+        self.assertEqual(profile['results'][0]['author'], 'author')
+        groups = self.client.get(reverse('api:groups')).json()
+        self.assertEqual(groups['results'][0]['posts_count'], 2)
+        url = reverse('api:follow_index')
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(self.reader_client.get(url).json()['results'], [])
+        follow = reverse('api:follow', args=[self.author.username])
+        self.assertTrue(self.reader_client.post(follow).json()['following'])
+        self.assertEqual(
+            len(self.reader_client.get(url).json()['results']), 5)
+        self.reader_client.delete(follow)
+        self.assertFalse(Follow.objects.exists())
+
+    @override_settings(API_PAGE_SIZE=4)
+    def test_follow_feed_merges_celebrity_posts(self):
+        """Лента подписок листается курсором по записям ленты вместе
+        с постами авторов без раскладки."""
+        celebrity = User.objects.create_user(username='celebrity')
+        Follow.objects.create(user=self.reader, author=self.author)
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            Follow.objects.create(user=self.reader, author=celebrity)
+            for number in range(2):
+                Post.objects.create(text=f'Звезда {number}', author=celebrity)
+            url = reverse('api:follow_index')
+            first = self.reader_client.get(url, {'fields': 'text'}).json()
+            second = self.reader_client.get(first['next']).json()
+        self.assertEqual(
+            [row['text'] for row in first['results'] + second['results']],
+            ['Звезда 1', 'Звезда 0', 'Пост 4', 'Пост 3', 'Пост 2', 'Пост 1',
+             'Пост 0'])
+        self.assertEqual(set(first['results'][0]), {'text'})
+        self.assertIsNone(second['next'])
+
+    def test_create_and_edit_post(self):
+        """Создание поста с группой по slug и правка только автором."""
+        response = self.send(self.author_client, 'post', reverse('api:posts'),
+                             {'text': 'Новый пост', 'group': 'api-group'})
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        data = response.json()
+        self.assertEqual(data['group'], self.group.slug)
+        url = reverse('api:post', args=[data['id']])
+        response = self.send(self.reader_client, 'patch', url,
+                             {'text': 'Чужая правка'})
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        response = self.send(self.author_client, 'patch', url,
+                             {'text': 'Исправленный пост'})
+        self.assertEqual(response.json()['text'], 'Исправленный пост')
+        self.assertEqual(response.json()['group'], self.group.slug)
+        response = self.send(self.author_client, 'patch', url, {'text': ''})
+        self.assertIn('text', response.json()['errors'])
+        response = self.send(self.client, 'post', reverse('api:posts'),
+                             {'text': 'Аноним'})
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_comments(self):
+        """Комментарии добавляются и читаются от старых к новым."""
+        url = reverse('api:comments', args=[self.post.pk])
+        for text in ('Первый', 'Второй'):
+            response = self.send(self.reader_client, 'post', url,
+                                 {'text': text})
+            self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        results = self.client.get(url).json()['results']
+        self.assertEqual([row['text'] for row in results],
+                         ['Первый', 'Второй'])
+        self.assertEqual(results[0]['author'], 'reader')
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_token_auth_without_csrf(self):
+        """Клиент с токеном пишет без CSRF-токена, сессия без него
+        получает отказ JSON."""
+        self.author.set_password('secret')
+        self.author.save()
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('api:token')
+        response = self.send(client, 'post', url,
+                             {'username': 'author', 'password': 'wrong'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.send(client, 'post', url,
+                             {'username': 'author', 'password': 'secret'})
+        token = response.json()['token']
+        response = client.post(
+            reverse('api:posts'), json.dumps({'text': 'С токеном'}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(response.json()['author'], 'author')
+        response = client.delete(url, HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        response = client.post(
+            reverse('api:posts'), json.dumps({'text': 'Отозванный'}),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+        client.force_login(self.author)
+        response = self.send(client, 'post', reverse('api:posts'),
+                             {'text': 'Без CSRF'})
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.assertIn('CSRF', response.json()['detail'])
+        client.get(reverse('posts:post_create'))
+        response = client.post(
+            reverse('api:posts'), json.dumps({'text': 'С CSRF'}),
+            content_type='application/json',
+            HTTP_X_CSRFTOKEN=client.cookies['csrftoken'].value)
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertFalse(Post.objects.filter(
+            text__in=['Отозванный', 'Без CSRF']).exists())
+
+    def test_serializers_agree(self):
+        """Путь через .values() даёт те же словари, что model_to_dict."""
+        results = benchmark.throughput(limit=5, repeat=1)
+        self.assertEqual(benchmark.values(5), benchmark.naive(5))
+        self.assertEqual(results['values']['queries'], 1)
+        self.assertGreater(results['naive']['queries'], 5)
@@ -0,0 +1,261 @@
+import json
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods
+
+from core.db.writer import write
+from posts.forms import CommentForm, PostForm
+from posts.models import Follow, Group, Post, User
+from posts.paginator import CursorPaginator, InvalidCursor
+from posts.timeline import TimelinePaginator
+
+from .auth import api_auth
+from .models import Token
+from .serializers import COMMENTS, GROUPS, POSTS
+
+NOT_JSON = 'Тело запроса должно быть объектом JSON.'
+
+
+def json_response(data, status=HTTPStatus.OK):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def error(detail, status):
+    return json_response({'detail': detail}, status)
+
+
+def login_required_for(*methods):
+    """Как ``login_required`` для запросов ``methods``, но отвечает 401
+    вместо перенаправления; пользователь определяется токеном или
+    сессией (``api.auth``)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method in methods
+                    and not request.user.is_authenticated):
+                return error('Требуется авторизация.',
+                             HTTPStatus.UNAUTHORIZED)
+            return view(request, *args, **kwargs)
+        return api_auth(error)(wrapper)
+    return decorator
+
+
+def parse_body(request):
+    """``(данные, файлы)`` запроса в JSON или в виде формы.
+
+    Для тела, которое не разбирается в объект JSON, данные — ``None``.
+    """
+    if request.content_type in ('multipart/form-data',
+                                'application/x-www-form-urlencoded'):
+        return request.POST, request.FILES
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None, None
+    return (data if isinstance(data, dict) else None), None
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        size = settings.API_PAGE_SIZE
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def paginated(request, queryset, serializer,
+              ordering=('-pub_date', '-pk')):
+    """Курсорная страница ``queryset`` с полями из ``?fields=``."""
+    names = serializer.select(request.GET.get('fields'))
+    keys = [name.lstrip('-') for name in ordering]
+    paginator = CursorPaginator(
+        serializer.values(queryset, names, keys), page_size(request),
+        ordering=ordering, transform=lambda row: serializer.row(row, names))
+    return cursor_response(request, paginator)
+
+
+def cursor_response(request, paginator, rows=None):
+    """Ответ со страницей ``paginator`` по ``?cursor=``; ``rows(объекты)``
+    превращает объекты страницы в словари ответа."""
+    try:
+        page = paginator.cursor_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return error('Неверный курсор.', HTTPStatus.BAD_REQUEST)
+    results = page.object_list
+    if rows is not None:
+        results = rows(results)
+    return json_response({
+        'results': results,
+        'next': page_link(request, page.next_cursor),
+        'previous': page_link(request, page.previous_cursor),
+    })
+
+
+def detail(request, queryset, serializer, status=HTTPStatus.OK):
+    names = serializer.select(request.GET.get('fields'))
+    rows = serializer.rows(queryset[:1], names)
+    if not rows:
+        raise Http404
+    return json_response(rows[0], status)
+
+
+def form_errors(form):
+    return json_response(
+        {'errors': form.errors.get_json_data()}, HTTPStatus.BAD_REQUEST)
+
+
+def post_data(data, post=None):
+    """Данные ``PostForm``: группа по slug, при правке — поверх поста."""
+    result = {}
+    if post is not None:
+        result = {'text': post.text, 'group': post.group_id or ''}
+    result.update((key, data[key]) for key in ('text', 'group')
+                  if key in data)
+    slug = result.get('group')
+    if slug and not isinstance(slug, int):
+        # Неизвестный slug оставляется как есть: его отклонит форма
+        result['group'] = Group.objects.filter(slug=slug).values_list(
+            'pk', flat=True).first() or slug
+    return result
+
+
+@require_http_methods(['POST', 'DELETE'])
+@login_required_for('DELETE')
+def token(request):
+    """Выдаёт токен по имени и паролю или отзывает токен запроса."""
+    if request.method == 'DELETE':
+        Token.objects.filter(user=request.user).delete()
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+    data, _ = parse_body(request)
+    if data is None:
+        return error(NOT_JSON, HTTPStatus.BAD_REQUEST)
+    user = authenticate(request, username=data.get('username'),
+                        password=data.get('password'))
+    if user is None:
+        return error('Неверное имя пользователя или пароль.',
+                     HTTPStatus.BAD_REQUEST)
+    token, _ = Token.objects.get_or_create(user=user)
+    return json_response({'token': token.key})
+
+
+@require_http_methods(['GET', 'POST'])
+@login_required_for('POST')
+def posts(request):
+    if request.method == 'GET':
+        return paginated(request, Post.objects.all(), POSTS)
+    data, files = parse_body(request)
+    if data is None:
+        return error(NOT_JSON, HTTPStatus.BAD_REQUEST)
+    form = PostForm(post_data(data), files=files)
+    if not form.is_valid():
+        return form_errors(form)
+    post = form.save(commit=False)
+    post.author = request.user
+    post.save()
+    return detail(request, Post.objects.filter(pk=post.pk), POSTS,
+                  HTTPStatus.CREATED)
+
+
+@require_http_methods(['GET', 'PATCH'])
+@login_required_for('PATCH')
+def post(request, post_id):
+    if request.method == 'GET':
+        return detail(request, Post.objects.filter(pk=post_id), POSTS)
+    post = get_object_or_404(Post, pk=post_id)
+    if post.author_id != request.user.pk:
+        return error('Править пост может только автор.',
+                     HTTPStatus.FORBIDDEN)
+    data, _ = parse_body(request)
+    if data is None:
+        return error(NOT_JSON, HTTPStatus.BAD_REQUEST)
+    form = PostForm(post_data(data, post), instance=post)
+    if not form.is_valid():
+        return form_errors(form)
+    form.save()
+    return detail(request, Post.objects.filter(pk=post_id), POSTS)
+
+
+@require_http_methods(['GET', 'POST'])
+@login_required_for('POST')
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method == 'GET':
+        return paginated(request, post.comments.all(), COMMENTS,
+                         ordering=('pub_date', 'pk'))
+    data, _ = parse_body(request)
+    if data is None:
+        return error(NOT_JSON, HTTPStatus.BAD_REQUEST)
+    form = CommentForm(data)
+    if not form.is_valid():
+        return form_errors(form)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    write(comment.save)
+    return detail(request, post.comments.filter(pk=comment.pk), COMMENTS,
+                  HTTPStatus.CREATED)
+
+
+@require_http_methods(['GET'])
+def groups(request):
+    return paginated(request, Group.objects.all(), GROUPS, ordering=('pk',))
+
+
+@require_http_methods(['GET'])
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return paginated(request, Post.objects.filter(group=group), POSTS)
+
+
+@require_http_methods(['GET'])
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return paginated(request, Post.objects.filter(author=author), POSTS)
+
+
+@require_http_methods(['GET'])
+@login_required_for('GET')
+def follow_index(request):
+    """Лента подписок: страница читается диапазоном индекса записей
+    ``TimelineEntry``, как в ``posts:follow_index``, а поля ответа —
+    одним запросом ``.values()`` по id постов страницы."""
+    names = POSTS.select(request.GET.get('fields'))
+
+    def rows(posts):
+        found = {
+            row['pk']: POSTS.row(row, names)
+            for row in POSTS.values(
+                Post.objects.filter(pk__in=[post.pk for post in posts]),
+                names, ['pk'])
+        }
+        return [found[post.pk] for post in posts if post.pk in found]
+
+    return cursor_response(
+        request, TimelinePaginator(request.user, page_size(request)), rows)
+
+
+@require_http_methods(['POST', 'DELETE'])
+@login_required_for('POST', 'DELETE')
+def follow(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    if request.method == 'DELETE':
+        Follow.objects.filter(author=author, user=request.user).delete()
+        return json_response({'following': False})
+    if author == request.user:
+        return error('Нельзя подписаться на себя.', HTTPStatus.BAD_REQUEST)
+    Follow.objects.get_or_create(user=request.user, author=author)
+    return json_response({'following': True})
@@ -0,0 +1,73 @@
+"""Кэширование с защитой от одновременного пересчёта (single flight).
+
+Значение хранится в конверте ``(value, fresh_until)`` дольше своего
+срока свежести. Когда срок истёк, пересчитывает значение только тот
+воркер, который первым взял блокировку ``<key>:lock`` через атомарный
+``cache.add``; остальные отдают устаревшее значение, а если его нет —
+ждут результат.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_KEY = '{key}:lock'
+POLL_INTERVAL = 0.05
+
+
+def incr(key, delta=1):
+    """Атомарный счётчик в кэше; создаётся при первом обращении."""
+    if not cache.add(key, delta, None):
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, None)
+
+
+def pack(value, timeout):
+    return value, time.time() + timeout
+
+
+def unpack(envelope):
+    """``(value, fresh)`` из конверта; для пустого ключа ``(None, False)``."""
+    if envelope is None:
+        return None, False
+    value, fresh_until = envelope
+    return value, fresh_until > time.time()
+
+
+def single_flight(key, compute, timeout, stale_timeout=None,
+                  lock_timeout=None):
+    """Значение ``key`` из кэша; при промахе — ``compute()`` в одном воркере.
+
+    ``timeout`` — срок свежести, ``stale_timeout`` — сколько ещё после
+    него можно отдавать старое значение, пока идёт пересчёт.
+    """
+    if stale_timeout is None:
+        stale_timeout = settings.SINGLE_FLIGHT_STALE_TIMEOUT
+    if lock_timeout is None:
+        lock_timeout = settings.SINGLE_FLIGHT_LOCK_TIMEOUT
+    envelope = cache.get(key)
+    value, fresh = unpack(envelope)
+    if fresh:
+        return value
+    lock_key = LOCK_KEY.format(key=key)
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, pack(value, timeout), timeout + stale_timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+    if envelope is not None:
+        return value
+    deadline = time.time() + lock_timeout
+    while time.time() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value, fresh = unpack(cache.get(key))
+        if fresh:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    # Держатель блокировки не успел или упал: считаем сами
+    return compute()
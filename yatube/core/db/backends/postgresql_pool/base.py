@@ -0,0 +1,13 @@
+"""PostgreSQL с пулом соединений процесса (нужен psycopg2)."""
+from django.db.backends.postgresql import base
+
+from ...pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def _close(self):
+        if self.connection is not None and self.connection.closed:
+            # Сервер оборвал соединение: в пул его не возвращаем
+            self.pool.release(self.connection, discard=True)
+            return
+        super()._close()
@@ -0,0 +1,22 @@
+"""SQLite с прагмами для нескольких воркеров.
+
+``OPTIONS['pragmas']`` выполняются на каждом новом соединении,
+например ``{'journal_mode': 'wal', 'busy_timeout': 5000}``: в режиме
+WAL читатели не блокируют писателя, а ``busy_timeout`` заставляет
+ждать блокировку вместо немедленной ошибки ``database is locked``.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
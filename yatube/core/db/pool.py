@@ -0,0 +1,175 @@
+"""Пул соединений с базой внутри процесса.
+
+Бэкенд Django закрывает соединение в конце запроса (``CONN_MAX_AGE``
+истёк) или при ошибке; с пулом ``close()`` возвращает соединение
+в пул, и следующий запрос берёт уже открытое. Число соединений
+процесса ограничено ``MAX_SIZE``: когда все заняты, запрос ждёт
+освободившееся не дольше ``TIMEOUT`` секунд.
+
+Пул у каждого процесса свой, поэтому процессы публикуют заполненность
+своих пулов в общий кэш (``publish_stats`` вызывается при сбросе
+метрик), и команда ``check_database`` видит пулы всех воркеров.
+"""
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+STATS_KEY = 'db:pool:{alias}:{pid}'
+PROCESSES_KEY = 'db:pool:{alias}:processes'
+
+
+class PoolExhausted(DatabaseError):
+    """Все соединения пула заняты дольше таймаута."""
+
+
+class ConnectionPool:
+    def __init__(self, connect, max_size, timeout):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.peak = 0
+        self.opened = 0
+        self.timeouts = 0
+
+    def acquire(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.timeouts += 1
+            raise PoolExhausted(
+                f'Все {self.max_size} соединений пула заняты')
+        try:
+            connection = self.idle.get_nowait()
+        except queue.Empty:
+            try:
+                connection = self.connect()
+            except Exception:
+                self.slots.release()
+                raise
+            with self.lock:
+                self.opened += 1
+        with self.lock:
+            self.in_use += 1
+            self.peak = max(self.peak, self.in_use)
+        return connection
+
+    def release(self, connection, discard=False):
+        """Возвращает соединение; сломанное (``discard``) закрывается."""
+        with self.lock:
+            self.in_use -= 1
+        if discard:
+            with self.lock:
+                self.opened -= 1
+            try:
+                connection.close()
+            except Exception:
+                pass
+        else:
+            self.idle.put(connection)
+        self.slots.release()
+
+    def stats(self, reset_peak=False):
+        """Состояние пула; ``peak`` — наибольшее число занятых
+        соединений с прошлого сброса."""
+        with self.lock:
+            stats = {
+                'max_size': self.max_size,
+                'in_use': self.in_use,
+                'peak': self.peak,
+                'idle': self.idle.qsize(),
+                'opened': self.opened,
+                'timeouts': self.timeouts,
+                'saturation': self.in_use / self.max_size,
+            }
+            if reset_peak:
+                self.peak = self.in_use
+            return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, max_size, timeout):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(connect, max_size, timeout)
+        return _pools[alias]
+
+
+def publish_stats():
+    """Кладёт в общий кэш состояние пулов этого процесса."""
+    with _pools_lock:
+        pools = dict(_pools)
+    timeout = settings.DB_POOL_STATS_TIMEOUT
+    for alias, pool in pools.items():
+        pid = os.getpid()
+        cache.set(STATS_KEY.format(alias=alias, pid=pid),
+                  pool.stats(reset_peak=True), timeout)
+        processes = PROCESSES_KEY.format(alias=alias)
+        known = cache.get(processes, set())
+        if pid not in known:
+            cache.set(processes, known | {pid}, None)
+
+
+def published_stats(alias):
+    """Состояние пулов ``alias`` во всех процессах, которые публиковали
+    его недавно: ``{pid: stats}``."""
+    processes = PROCESSES_KEY.format(alias=alias)
+    known = cache.get(processes, set())
+    stored = cache.get_many(
+        [STATS_KEY.format(alias=alias, pid=pid) for pid in known])
+    result = {
+        pid: stored[STATS_KEY.format(alias=alias, pid=pid)]
+        for pid in known
+        if STATS_KEY.format(alias=alias, pid=pid) in stored
+    }
+    if len(result) < len(known):
+        # Процесс завершился или простаивает: его запись истекла
+        cache.set(processes, set(result), None)
+    return result
+
+
+class PooledDatabaseWrapperMixin:
+    """Примесь к ``DatabaseWrapper``: соединения берутся из пула.
+
+    Размер и таймаут задаются в ``OPTIONS['pool']``:
+    ``{'max_size': 10, 'timeout': 5}``.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS'].get('pool', {})
+        return get_pool(
+            self.alias,
+            lambda: super(PooledDatabaseWrapperMixin, self)
+            .get_new_connection(self.get_connection_params()),
+            options.get('max_size', 10),
+            options.get('timeout', 5),
+        )
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        discard = False
+        try:
+            # Незавершённая транзакция не должна достаться другому запросу
+            self.connection.rollback()
+        except Exception:
+            discard = True
+        self.pool.release(self.connection, discard=discard)
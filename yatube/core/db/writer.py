@@ -0,0 +1,117 @@
+"""Очередь записи: один поток пишет пачками вместо многих конкурентов.
+
+SQLite допускает одного писателя, и одновременные ``INSERT`` из
+нескольких потоков ждут блокировку друг друга или падают с
+``database is locked``. ``write(func)`` при ``WRITER_QUEUE = True``
+отдаёт ``func`` потоку-писателю процесса и ждёт результат: писатель
+собирает до ``WRITER_QUEUE_BATCH_SIZE`` заданий (ждёт следующие не
+дольше ``WRITER_QUEUE_DELAY`` секунд) и выполняет их в одной
+транзакции — одна блокировка и одна синхронизация диска на пачку.
+
+Очередь своя у каждого процесса: писатели разных процессов по-прежнему
+соревнуются за блокировку базы.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+
+from .. import routers
+
+logger = logging.getLogger(__name__)
+
+
+def _snapshot(func):
+    """Состояние объекта, чей метод ``func``, до записи пачки."""
+    instance = getattr(func, '__self__', None)
+    if isinstance(instance, models.Model):
+        return instance, instance.pk, instance._state.adding
+    return None
+
+
+def _restore(snapshot):
+    """Возвращает объекту состояние до отката пачки: новый объект
+    снова вставляется, а не обновляет строку, которой уже нет."""
+    if snapshot is not None:
+        instance, pk, adding = snapshot
+        instance.pk = pk
+        instance._state.adding = adding
+
+
+class WriterQueue:
+    def __init__(self, batch_size, delay):
+        self.batch_size = batch_size
+        self.delay = delay
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, func):
+        future = Future()
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='db-writer', daemon=True)
+                self.thread.start()
+        self.queue.put((func, future))
+        return future
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self.queue.get(timeout=max(remaining, 0)))
+                except queue.Empty:
+                    break
+            close_old_connections()
+            self.write(batch)
+
+    def write(self, batch):
+        snapshots = [_snapshot(func) for func, _ in batch]
+        try:
+            with transaction.atomic():
+                results = [func() for func, _ in batch]
+        except Exception:
+            # Ошибка одного задания не должна отменять остальные
+            logger.debug('Пачка записи откатилась, пишем по одному')
+            for (func, future), snapshot in zip(batch, snapshots):
+                _restore(snapshot)
+                try:
+                    with transaction.atomic():
+                        result = func()
+                except Exception as error:
+                    future.set_exception(error)
+                else:
+                    # Результат отдаётся только после коммита
+                    future.set_result(result)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+_writer = None
+
+
+def writer():
+    global _writer
+    if _writer is None:
+        _writer = WriterQueue(
+            settings.WRITER_QUEUE_BATCH_SIZE, settings.WRITER_QUEUE_DELAY)
+    return _writer
+
+
+def write(func):
+    """Выполняет запись ``func()`` через очередь или сразу."""
+    # Внутри транзакции писатель не увидит её незакоммиченные данные
+    if (not settings.WRITER_QUEUE
+            or transaction.get_connection().in_atomic_block):
+        return func()
+    routers.note_write()
+    return writer().submit(func).result(settings.WRITER_QUEUE_TIMEOUT)
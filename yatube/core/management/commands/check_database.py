@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ...db.pool import PooledDatabaseWrapperMixin, published_stats
+
+
+class Command(BaseCommand):
+    help = ('Проверяет соединения с базами: отклик, режим SQLite и '
+            'заполненность пула и сервера PostgreSQL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-saturation', type=float, default=0.9,
+            help='Доля занятых соединений, выше которой проверка падает.')
+
+    def handle(self, *args, **options):
+        problems = []
+        for connection in connections.all():
+            try:
+                report, saturation = self.inspect(connection)
+            except Exception as error:
+                problems.append(f'{connection.alias}: {error}')
+                continue
+            self.stdout.write(f'{connection.alias}: {report}')
+            if saturation is not None and (
+                    saturation >= options['max_saturation']):
+                problems.append(
+                    f'{connection.alias}: занято {saturation:.0%} соединений')
+        if problems:
+            raise CommandError('; '.join(problems))
+
+    def inspect(self, connection):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            ping = (time.perf_counter() - started) * 1000
+            max_age = connection.settings_dict['CONN_MAX_AGE']
+            parts = [f'{connection.vendor}, отклик {ping:.1f} мс',
+                     f'CONN_MAX_AGE {max_age}']
+            saturation = None
+            if connection.vendor == 'sqlite':
+                parts.append(self.sqlite_state(cursor))
+            elif connection.vendor == 'postgresql':
+                # Соединения всех воркеров против max_connections сервера
+                cursor.execute(
+                    "SELECT (SELECT count(*) FROM pg_stat_activity), "
+                    "current_setting('max_connections')::int")
+                used, limit = cursor.fetchone()
+                saturation = used / limit
+                parts.append(f'сервер: {used} из {limit} соединений')
+        if isinstance(connection, PooledDatabaseWrapperMixin):
+            # У пула самой команды соединение занято только ею, поэтому
+            # читаются пулы воркеров, опубликованные в общий кэш
+            pools = list(published_stats(connection.alias).values())
+            parts.append(self.pools_state(pools))
+            if pools:
+                # Пул у каждого процесса свой: упирается самый занятый
+                saturation = max(saturation or 0, max(
+                    stats['peak'] / stats['max_size'] for stats in pools))
+        return ', '.join(parts), saturation
+
+    def pools_state(self, pools):
+        if not pools:
+            return 'пулы воркеров: нет данных'
+        return (
+            'пулы воркеров: {processes}, занято {in_use} из {max_size}, '
+            'пик {peak}, таймаутов {timeouts}'.format(
+                processes=len(pools),
+                **{field: sum(stats[field] for stats in pools)
+                   for field in ('in_use', 'max_size', 'peak', 'timeouts')}))
+
+    def sqlite_state(self, cursor):
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+        cursor.execute('PRAGMA busy_timeout')
+        busy_timeout = cursor.fetchone()[0]
+        state = f'journal_mode {journal_mode}, busy_timeout {busy_timeout} мс'
+        if journal_mode != 'wal':
+            self.stderr.write(
+                'SQLite без WAL: читатели блокируют запись, '
+                'включите core.db.backends.sqlite3')
+        return state
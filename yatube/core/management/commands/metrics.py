@@ -0,0 +1,61 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import metrics
+
+
+def percentile(histogram, fraction):
+    """Верхняя граница корзины, в которую попадает доля ``fraction``."""
+    total = histogram['count']
+    seen = 0
+    for limit in settings.METRICS_BUCKETS:
+        seen += histogram[str(limit)]
+        if total and seen >= fraction * total:
+            return f'≤{limit}'
+    return f'>{settings.METRICS_BUCKETS[-1]}'
+
+
+def mean(histogram, scale=1):
+    if not histogram['count']:
+        return 0.0
+    return histogram['sum'] / histogram['count'] / scale
+
+
+class Command(BaseCommand):
+    help = 'Показывает гистограммы времени запросов по именам URL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json', action='store_true', help='Вывести сырые счётчики.')
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить гистограммы после вывода.')
+
+    def handle(self, *args, **options):
+        snapshot = metrics.snapshot()
+        if options['json']:
+            self.stdout.write(json.dumps(snapshot, indent=2))
+        else:
+            for name, data in snapshot.items():
+                self.stdout.write(self.describe(name, data))
+        if options['reset']:
+            metrics.reset()
+
+    def describe(self, name, data):
+        total = data['total']
+        return (
+            f'{name}: запросов {total["count"]}, '
+            f'в среднем {mean(total, 1000):.1f} мс, '
+            f'p50 {percentile(total, 0.5)} мс, '
+            f'p95 {percentile(total, 0.95)} мс; '
+            f'база {mean(data["db"], 1000):.1f} мс '
+            f'({mean(data["queries"]):.1f} запросов), '
+            f'шаблоны {mean(data["template"], 1000):.1f} мс, '
+            f'миниатюры {mean(data["thumbnails"], 1000):.1f} мс, '
+            f'кэш {data["cache_hits"]["sum"]} попаданий / '
+            f'{data["cache_misses"]["sum"]} промахов; '
+            f'304 {data["not_modified"]["sum"]} раз, сэкономлено '
+            f'{data["bytes_saved"]["sum"] / 1024:.1f} КБ и '
+            f'{data["render_ms_saved"]["sum"]} мс')
@@ -0,0 +1,60 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import tasks
+
+
+def worker(stop, once):
+    # Ctrl+C получает вся группа процессов, останавливает их родитель
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    tasks.work(stop, once)
+
+
+class Command(BaseCommand):
+    help = ('Запускает пул процессов, которые выполняют фоновые задачи '
+            'из очереди core.tasks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.TASK_WORKERS,
+            help='Число процессов; 0 — выполнять задачи в этом процессе.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.')
+
+    def handle(self, *args, **options):
+        stop = multiprocessing.Event()
+        if not options['processes']:
+            if options['once']:
+                done = tasks.run_pending()
+                self.stdout.write(f'Выполнено задач: {done}')
+                return
+            self.stop_on_signals(stop)
+            tasks.work(stop)
+            return
+        # Дочерние процессы открывают свои соединения с базой
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=worker, args=(stop, options['once']),
+                name=f'tasks-{number}')
+            for number in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stop_on_signals(stop)
+        self.stdout.write(f'Запущено воркеров: {len(processes)}')
+        for process in processes:
+            process.join()
+
+    def stop_on_signals(self, stop):
+        def handler(signum, frame):
+            self.stdout.write('Завершаю текущие задачи...')
+            stop.set()
+        signal.signal(signal.SIGINT, handler)
+        signal.signal(signal.SIGTERM, handler)
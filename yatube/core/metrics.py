@@ -0,0 +1,206 @@
+"""Метрики производительности запросов.
+
+``PerformanceMiddleware`` открывает на время запроса сборщик
+``RequestMetrics``: время и число запросов к базе, время рендеринга
+шаблонов, попадания и промахи кэша и работу с миниатюрами. Код
+приложения отмечает свою работу через ``timer`` и ``count``, вне
+запроса они ничего не делают.
+
+Итоги запроса попадают в гистограммы по имени URL (``posts:index``,
+``posts:profile``...). Гистограммы копятся в памяти процесса и
+раз в ``METRICS_FLUSH_INTERVAL`` секунд складываются в общий кэш,
+откуда их читает команда ``metrics``.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import incr
+from .db import pool
+
+METRIC_KEY = 'metrics:{name}:{metric}:{field}'
+NAMES_KEY = 'metrics:names'
+# Метрики, для которых строятся гистограммы времени
+TIMED = ('total', 'db', 'template', 'thumbnails')
+COUNTED = ('queries', 'cache_hits', 'cache_misses', 'thumbnails_pending',
+           'thumbnails_scheduled', 'not_modified', 'bytes_saved',
+           'render_ms_saved')
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """Сборщик метрик одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = defaultdict(float)
+        self.counts = Counter()
+        self._depth = Counter()
+
+    def add_time(self, name, seconds):
+        self.timings[name] += seconds * 1000
+
+    def elapsed(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """Значение заголовка ``Server-Timing``."""
+        parts = [
+            f'db;dur={self.timings["db"]:.1f};'
+            f'desc="{self.counts["queries"]} queries"',
+            f'template;dur={self.timings["template"]:.1f}',
+            f'cache;desc="{self.counts["cache_hits"]} hits, '
+            f'{self.counts["cache_misses"]} misses"',
+            f'thumbnails;dur={self.timings["thumbnails"]:.1f};'
+            f'desc="{self.counts["thumbnails_pending"]} pending, '
+            f'{self.counts["thumbnails_scheduled"]} scheduled"',
+            f'total;dur={self.elapsed():.1f}',
+        ]
+        return ', '.join(parts)
+
+
+def current():
+    """Сборщик текущего запроса или ``None``."""
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def collect():
+    _local.metrics = metrics = RequestMetrics()
+    try:
+        yield metrics
+    finally:
+        _local.metrics = None
+
+
+@contextmanager
+def timer(name):
+    """Добавляет время блока к метрике ``name``.
+
+    Вложенные блоки с тем же именем (шаблон внутри шаблона) не
+    считаются повторно.
+    """
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    metrics._depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._depth[name] -= 1
+        if not metrics._depth[name]:
+            metrics.add_time(name, time.perf_counter() - started)
+
+
+def count(name, value=1):
+    metrics = current()
+    if metrics is not None:
+        metrics.counts[name] += value
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка ``connection.execute_wrapper``: число и время запросов."""
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_time('db', time.perf_counter() - started)
+        metrics.counts['queries'] += 1
+
+
+def bucket(value):
+    """Верхняя граница корзины гистограммы для ``value`` мс."""
+    buckets = settings.METRICS_BUCKETS
+    index = bisect_left(buckets, value)
+    return str(buckets[index]) if index < len(buckets) else 'inf'
+
+
+class Histograms:
+    """Гистограммы процесса, которые периодически сбрасываются в кэш.
+
+    В кэше у каждой пары (имя URL, метрика) есть счётчики ``count``,
+    ``sum`` (в микросекундах для времени) и по одному на корзину.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.names = set()
+        self.flushed = time.monotonic()
+
+    def observe(self, name, metrics):
+        values = dict(metrics.timings, total=metrics.elapsed())
+        with self.lock:
+            self.names.add(name)
+            for metric in TIMED:
+                value = values.get(metric, 0.0)
+                self.pending[name, metric, 'count'] += 1
+                self.pending[name, metric, 'sum'] += int(value * 1000)
+                self.pending[name, metric, bucket(value)] += 1
+            for metric in COUNTED:
+                self.pending[name, metric, 'count'] += 1
+                self.pending[name, metric, 'sum'] += metrics.counts[metric]
+        if (time.monotonic() - self.flushed
+                >= settings.METRICS_FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            names, self.names = self.names, set()
+            self.flushed = time.monotonic()
+        if names - set(cache.get(NAMES_KEY, ())):
+            cache.set(NAMES_KEY, set(cache.get(NAMES_KEY, ())) | names,
+                      None)
+        for (name, metric, field), value in pending.items():
+            if value:
+                incr(METRIC_KEY.format(
+                    name=name, metric=metric, field=field), value)
+        pool.publish_stats()
+
+
+histograms = Histograms()
+
+
+def _keys(name):
+    """Ключи кэша гистограмм имени ``name``: ``{ключ: (метрика, поле)}``."""
+    buckets = [str(limit) for limit in settings.METRICS_BUCKETS] + ['inf']
+    keys = {}
+    for metric in TIMED + COUNTED:
+        fields = ['count', 'sum'] + (buckets if metric in TIMED else [])
+        for field in fields:
+            key = METRIC_KEY.format(name=name, metric=metric, field=field)
+            keys[key] = metric, field
+    return keys
+
+
+def snapshot():
+    """Гистограммы всех процессов из кэша: ``{имя: {метрика: {...}}}``."""
+    histograms.flush()
+    result = {}
+    for name in sorted(cache.get(NAMES_KEY, ())):
+        keys = _keys(name)
+        stored = cache.get_many(keys)
+        data = defaultdict(dict)
+        for key, (metric, field) in keys.items():
+            data[metric][field] = stored.get(key, 0)
+        result[name] = dict(data)
+    return result
+
+
+def reset():
+    histograms.flush()
+    for name in cache.get(NAMES_KEY, ()):
+        cache.delete_many(list(_keys(name)))
+    cache.delete(NAMES_KEY)
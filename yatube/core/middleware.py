@@ -0,0 +1,74 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+PRIMARY_COOKIE = 'read_primary'
+
+
+class PerformanceMiddleware:
+    """Собирает метрики запроса и отдаёт их в заголовке ``Server-Timing``.
+
+    Стоит первым в ``MIDDLEWARE``, чтобы учитывать работу остальных.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with metrics.collect() as collected, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.record_query))
+            response = self.get_response(request)
+        response['Server-Timing'] = collected.server_timing()
+        match = request.resolver_match
+        if match is not None and match.view_name:
+            metrics.histograms.observe(match.view_name, collected)
+        return response
+
+
+class ReplicaMiddleware:
+    """Отправляет чтение представлений ``REPLICA_VIEWS`` на реплики.
+
+    Запросы с записью и все запросы пользователя в течение
+    ``REPLICA_STICKY_SECONDS`` после записи читают основную базу,
+    чтобы автор сразу видел свой пост или комментарий: время записи
+    хранится в cookie ``read_primary``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.wrote()
+            routers.start()
+        if wrote:
+            response.set_cookie(
+                PRIMARY_COOKIE, str(int(time.time())),
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (not settings.DATABASE_REPLICAS
+                or request.method not in ('GET', 'HEAD')
+                or request.resolver_match.view_name
+                not in settings.REPLICA_VIEWS
+                or self.pinned(request)):
+            return None
+        routers.read_from_replicas()
+        return None
+
+    def pinned(self, request):
+        try:
+            written = int(request.COOKIES.get(PRIMARY_COOKIE, ''))
+        except ValueError:
+            return False
+        return time.time() - written < settings.REPLICA_STICKY_SECONDS
@@ -5,8 +5,47 @@ class CreatedModel(models.Model):
     """Абстрактная модель. Добавляет дату создания."""
     pub_date = models.DateTimeField(
         'Дата публикации',
-        auto_now_add=True
+        auto_now_add=True,
+        db_index=True
     )
 
     class Meta:
         abstract = True
+
+
+class Task(models.Model):
+    """Фоновая задача в очереди ``core.tasks``."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Функция', max_length=200)
+    args = models.TextField('Аргументы', default='[]')
+    key = models.CharField(
+        'Ключ идемпотентности', max_length=200, unique=True, null=True,
+        blank=True)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField('Попытки', default=0)
+    max_attempts = models.PositiveIntegerField('Наибольшее число попыток')
+    run_at = models.DateTimeField('Выполнить не раньше')
+    locked_until = models.DateTimeField(
+        'Занята воркером до', null=True, blank=True)
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='task_status_run_at_idx'),
+        ]
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
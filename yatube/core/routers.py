@@ -0,0 +1,56 @@
+"""Маршрутизация чтения на реплики базы.
+
+Запись всегда идёт в ``default``. Чтение уходит на случайную реплику
+из ``DATABASE_REPLICAS`` только после ``read_from_replicas()`` — его
+вызывает ``ReplicaMiddleware`` для представлений из ``REPLICA_VIEWS``.
+Всё остальное, в том числе фоновые потоки и команды, читает основную
+базу.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+# Таблица кэша (бэкенд db) живёт только в основной базе
+PRIMARY_ONLY_APPS = {'django_cache'}
+
+_local = threading.local()
+
+
+def start():
+    """Сбрасывает состояние в начале запроса: чтение с основной базы."""
+    _local.replicas = False
+    _local.wrote = False
+
+
+def read_from_replicas():
+    _local.replicas = True
+
+
+def note_write():
+    """Отмечает запись, сделанную за запрос другим потоком."""
+    _local.wrote = True
+
+
+def wrote():
+    """Была ли запись в базу с начала запроса."""
+    return getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (settings.DATABASE_REPLICAS and getattr(_local, 'replicas', False)
+                and not wrote()
+                and model._meta.app_label not in PRIMARY_ONLY_APPS):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # После записи запрос дочитывает данные с основной базы
+        if model._meta.app_label not in PRIMARY_ONLY_APPS:
+            note_write()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы
+        return True
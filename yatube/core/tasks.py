@@ -0,0 +1,198 @@
+"""Фоновые задачи, которые выполняются после записи.
+
+Побочные эффекты записи (миниатюры, раскладка постов по лентам
+подписок) ставятся в очередь через ``enqueue``, а не выполняются в
+запросе, и время записи больше не растёт с каждым новым эффектом.
+Очередь — таблица ``Task`` в основной базе: задача сохраняется в той же
+транзакции, что и данные, и воркеры видят её только после коммита.
+Выполняют задачи процессы команды ``run_workers``.
+
+Задача — функция, отмеченная декоратором ``task``, с аргументами,
+которые сериализуются в JSON. Неудачная попытка повторяется с
+удваивающейся паузой ``TASK_RETRY_DELAY``, после ``max_attempts``
+попыток задача остаётся в состоянии ``failed``. ``key`` делает постановку
+идемпотентной: пока задача с тем же ключом ждёт, выполняется или
+выполнена и хранится (``TASK_RETENTION_DAYS``), повторная постановка
+ничего не делает; не выполненную задачу новая постановка заменяет.
+Воркеры удаляют старые задачи раз в ``TASK_PURGE_INTERVAL`` секунд.
+
+При ``TASKS_SYNC`` (разработка и тесты) задача выполняется сразу при
+постановке, без таблицы и повторов.
+"""
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import Task
+
+logger = logging.getLogger(__name__)
+_registry = {}
+
+
+def task(max_attempts=None, atomic=True):
+    """Регистрирует функцию как задачу под её полным именем.
+
+    Задача выполняется в одной транзакции. С ``atomic=False`` она сама
+    управляет транзакциями — так выполняются долгие задачи с внешними
+    вызовами (отправка почты), чтобы не держать блокировку записи базы.
+    """
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        func.atomic = atomic
+        _registry[func.task_name] = func
+        return func
+    return decorator
+
+
+def resolve(name):
+    """Функция задачи ``name``; модуль импортируется при необходимости."""
+    if name not in _registry:
+        import_string(name)
+    return _registry[name]
+
+
+def enqueue(func, *args, key=None, delay=0):
+    """Ставит ``func(*args)`` в очередь; ``False``, если задача с ключом
+    ``key`` уже есть."""
+    if settings.TASKS_SYNC:
+        func(*args)
+        return True
+    if key is not None:
+        # Ключ задачи, исчерпавшей попытки, не должен блокировать её навсегда
+        Task.objects.filter(key=key, status=Task.FAILED).delete()
+        if Task.objects.filter(key=key).exists():
+            return False
+    # Одновременную постановку с тем же ключом отсекает уникальный индекс
+    Task.objects.bulk_create([Task(
+        name=func.task_name,
+        args=json.dumps(args),
+        key=key,
+        max_attempts=func.max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+    return True
+
+
+def _ready(now):
+    """Задачи, которые можно взять: ждущие своего времени и брошенные
+    упавшим воркером."""
+    return (Q(status=Task.PENDING, run_at__lte=now)
+            | Q(status=Task.RUNNING, locked_until__lt=now))
+
+
+def claim(limit):
+    """Забирает до ``limit`` готовых задач для этого воркера.
+
+    Строка переходит в ``running`` условным ``UPDATE``: если её уже
+    забрал другой воркер, условие не выполнится, и задача пропускается.
+    """
+    now = timezone.now()
+    candidates = list(Task.objects.filter(_ready(now)).order_by(
+        'run_at').values_list('pk', flat=True)[:limit])
+    claimed = [
+        pk for pk in candidates
+        if Task.objects.filter(_ready(now), pk=pk).update(
+            status=Task.RUNNING, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(
+                seconds=settings.TASK_LOCK_TIMEOUT))
+    ]
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_at'))
+
+
+def release(items):
+    """Возвращает в очередь взятые, но не начатые задачи."""
+    Task.objects.filter(pk__in=[item.pk for item in items]).update(
+        status=Task.PENDING, attempts=F('attempts') - 1, locked_until=None)
+
+
+def execute(item):
+    """Выполняет взятую задачу и записывает исход; ``True`` при успехе."""
+    try:
+        if item.attempts > item.max_attempts:
+            # Задачу брали столько раз, и каждый раз воркер падал
+            raise RuntimeError('Воркер не завершил задачу')
+        func = resolve(item.name)
+        args = json.loads(item.args)
+        with metrics.collect() as collected:
+            if func.atomic:
+                with transaction.atomic():
+                    # Транзакция задачи сразу начинается с записи: SQLite
+                    # ждёт блокировку записи по busy_timeout, а не
+                    # отказывает при повышении блокировки чтения, взятой
+                    # другим воркером
+                    Task.objects.filter(pk=item.pk).update(
+                        locked_until=F('locked_until'))
+                    func(*args)
+            else:
+                func(*args)
+    except Exception as error:
+        logger.exception('Задача %s (%s) не выполнена, попытка %s из %s',
+                         item.pk, item.name, item.attempts,
+                         item.max_attempts)
+        retry = item.attempts < item.max_attempts
+        delay = settings.TASK_RETRY_DELAY * 2 ** (item.attempts - 1)
+        Task.objects.filter(pk=item.pk).update(
+            status=Task.PENDING if retry else Task.FAILED,
+            run_at=timezone.now() + timedelta(seconds=delay),
+            finished=None if retry else timezone.now(),
+            locked_until=None,
+            last_error=repr(error),
+        )
+        return False
+    Task.objects.filter(pk=item.pk).update(
+        status=Task.DONE, finished=timezone.now(), locked_until=None)
+    metrics.histograms.observe(f'task:{item.name}', collected)
+    return True
+
+
+def purge():
+    """Удаляет завершённые задачи старше ``TASK_RETENTION_DAYS``."""
+    deadline = timezone.now() - timedelta(days=settings.TASK_RETENTION_DAYS)
+    return Task.objects.filter(
+        status__in=(Task.DONE, Task.FAILED), finished__lt=deadline,
+    ).delete()[0]
+
+
+def run_pending():
+    """Выполняет готовые задачи в текущем процессе, пока они есть;
+    возвращает число выполненных попыток."""
+    done = 0
+    while True:
+        batch = claim(settings.TASK_BATCH_SIZE)
+        if not batch:
+            return done
+        for item in batch:
+            execute(item)
+        done += len(batch)
+
+
+def work(stop, once=False):
+    """Цикл воркера: выполняет задачи, пока не выставлен ``stop``."""
+    purged = None
+    while not stop.is_set():
+        close_old_connections()
+        if (purged is None or time.monotonic() - purged
+                >= settings.TASK_PURGE_INTERVAL):
+            purge()
+            purged = time.monotonic()
+        batch = claim(settings.TASK_BATCH_SIZE)
+        if not batch:
+            if once:
+                break
+            time.sleep(settings.TASK_POLL_INTERVAL)
+            continue
+        for number, item in enumerate(batch):
+            if stop.is_set():
+                release(batch[number:])
+                break
+            execute(item)
+    metrics.histograms.flush()
@@ -0,0 +1,22 @@
+"""Шаблонизатор Django с учётом времени рендеринга в метриках запроса."""
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as backend
+
+from . import metrics
+
+
+class Template(backend.Template):
+    def render(self, context=None, request=None):
+        with metrics.timer('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            backend.reraise(exc, self)
@@ -0,0 +1,31 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..cache import LOCK_KEY, pack, single_flight
+
+
+class SingleFlightTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.compute = mock.Mock(return_value='new')
+
+    def test_miss_computes_once(self):
+        """Промах считается один раз, дальше значение из кэша."""
+        self.assertEqual(single_flight('key', self.compute, 60), 'new')
+        self.assertEqual(single_flight('key', self.compute, 60), 'new')
+        self.compute.assert_called_once()
+
+    def test_stale_value_served_while_locked(self):
+        """Пока другой воркер пересчитывает ключ, отдаётся старое значение."""
+        cache.set('key', pack('old', -1), 60)
+        cache.add(LOCK_KEY.format(key='key'), 1, 60)
+        self.assertEqual(single_flight('key', self.compute, 60), 'old')
+        self.compute.assert_not_called()
+
+    def test_stale_value_recomputed_by_lock_holder(self):
+        """Просроченное значение пересчитывает взявший блокировку."""
+        cache.set('key', pack('old', -1), 60)
+        self.assertEqual(single_flight('key', self.compute, 60), 'new')
+        self.assertIsNone(cache.get(LOCK_KEY.format(key='key')))
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+
+from ..db.backends.sqlite3.base import DatabaseWrapper
+from ..db import pool as db_pool
+from ..db.pool import (
+    ConnectionPool, PoolExhausted, get_pool, publish_stats, published_stats,
+)
+from ..management.commands.check_database import Command as CheckDatabase
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(mock.Mock, max_size=2, timeout=0.01)
+
+    def test_released_connection_reused(self):
+        """Возвращённое соединение достаётся следующему запросу."""
+        connection = self.pool.acquire()
+        self.pool.release(connection)
+        self.assertIs(self.pool.acquire(), connection)
+        self.assertEqual(self.pool.stats()['opened'], 1)
+
+    def test_exhausted_pool_times_out(self):
+        """Когда все соединения заняты, запрос ждёт и получает ошибку."""
+        self.pool.acquire()
+        self.pool.acquire()
+        self.assertEqual(self.pool.stats()['saturation'], 1)
+        with self.assertRaises(PoolExhausted):
+            self.pool.acquire()
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+
+    def test_discarded_connection_closed(self):
+        """Сломанное соединение закрывается и освобождает место."""
+        connection = self.pool.acquire()
+        self.pool.release(connection, discard=True)
+        connection.close.assert_called_once()
+        self.assertIsNot(self.pool.acquire(), connection)
+
+    def test_stats_published_for_other_processes(self):
+        """Пик занятых соединений процесса виден через общий кэш."""
+        cache.clear()
+        pool = get_pool('published', mock.Mock, max_size=2, timeout=0.01)
+        self.addCleanup(db_pool._pools.pop, 'published')
+        connection = pool.acquire()
+        pool.acquire()
+        pool.release(connection)
+        publish_stats()
+        stats = list(published_stats('published').values())
+        self.assertEqual([(item['in_use'], item['peak']) for item in stats],
+                         [(1, 2)])
+        self.assertEqual(pool.stats()['peak'], 1)
+        self.assertEqual(
+            CheckDatabase().pools_state(stats),
+            'пулы воркеров: 1, занято 1 из 2, пик 2, таймаутов 0')
+        cache.clear()
+        self.assertEqual(published_stats('published'), {})
+
+
+class SqlitePragmasTest(SimpleTestCase):
+    # Тест открывает своё соединение с временной базой
+    databases = {'default'}
+
+    def test_pragmas_applied_to_new_connections(self):
+        """Прагмы из OPTIONS выполняются на каждом соединении."""
+        directory = tempfile.mkdtemp()
+        settings_dict = dict(
+            connections['default'].settings_dict,
+            NAME=os.path.join(directory, 'db.sqlite3'),
+            OPTIONS={'pragmas': {'journal_mode': 'wal',
+                                 'busy_timeout': 1234}},
+        )
+        wrapper = DatabaseWrapper(settings_dict, alias='pragmas')
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 1234)
+        finally:
+            wrapper.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class CheckDatabaseTest(TestCase):
+    def test_reports_connection(self):
+        """Проверка отвечает по каждой базе."""
+        out = StringIO()
+        call_command('check_database', stdout=out, stderr=StringIO())
+        self.assertIn('default: sqlite', out.getvalue())
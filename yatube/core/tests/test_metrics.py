@@ -0,0 +1,54 @@
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import metrics
+
+
+class PerformanceMiddlewareTest(TestCase):
+    def setUp(self):
+        # Сначала сбрасываются гистограммы прошлых запросов процесса,
+        # иначе они попадут в очищенный кэш
+        metrics.reset()
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Ответ несёт заголовок Server-Timing с запросами к базе."""
+        response = self.client.get('/')
+        timing = response['Server-Timing']
+        for part in ('db;', 'template;', 'cache;', 'thumbnails;', 'total;'):
+            self.assertIn(part, timing)
+        self.assertNotIn('desc="0 queries"', timing)
+
+    def test_histograms_by_url_name(self):
+        """Гистограммы копятся по имени URL и видны команде metrics."""
+        self.client.get('/')
+        self.client.get('/')
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['posts:index']['total']['count'], 2)
+        self.assertGreater(snapshot['posts:index']['queries']['sum'], 0)
+        out = StringIO()
+        call_command('metrics', reset=True, stdout=out)
+        self.assertIn('posts:index: запросов 2', out.getvalue())
+        self.assertEqual(metrics.snapshot(), {})
+
+
+class TimerTest(TestCase):
+    def test_nested_timer_counted_once(self):
+        """Вложенный блок с тем же именем не удваивает время."""
+        with metrics.collect() as collected:
+            with metrics.timer('template'):
+                with metrics.timer('template'):
+                    time.sleep(0.05)
+        self.assertLess(collected.timings['template'], 100)
+        self.assertGreaterEqual(collected.timings['template'], 50)
+
+    def test_outside_request_noop(self):
+        """Вне запроса метрики ничего не собирают."""
+        metrics.count('queries')
+        with metrics.timer('db'):
+            pass
+        self.assertIsNone(metrics.current())
@@ -0,0 +1,52 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve
+
+from posts.models import Post
+
+from ..middleware import PRIMARY_COOKIE, ReplicaMiddleware
+from ..routers import ReplicaRouter
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.middleware = ReplicaMiddleware(self.view)
+        self.write = False
+
+    def view(self, request):
+        """Имитирует обработку: process_view, запись и чтение."""
+        self.middleware.process_view(request, None, (), {})
+        if self.write:
+            self.router.db_for_write(Post)
+        return HttpResponse(self.router.db_for_read(Post))
+
+    def request(self, path, method='get', cookies=None):
+        request = getattr(RequestFactory(), method)(path)
+        request.resolver_match = resolve(path)
+        request.COOKIES.update(cookies or {})
+        return self.middleware(request)
+
+    def test_feed_views_read_from_replica(self):
+        """Ленты читают с реплики, остальные представления — с основной."""
+        self.assertEqual(self.request('/').content, b'replica1')
+        self.assertEqual(
+            self.request('/posts/1/edit/').content, b'default')
+        self.assertEqual(
+            self.request('/', method='post').content, b'default')
+
+    def test_write_pins_user_to_primary(self):
+        """После записи запросы пользователя читают основную базу."""
+        self.write = True
+        response = self.request('/profile/author/follow/')
+        self.assertEqual(response.content, b'default')
+        self.write = False
+        cookies = {PRIMARY_COOKIE: response.cookies[PRIMARY_COOKIE].value}
+        self.assertEqual(
+            self.request('/', cookies=cookies).content, b'default')
+        self.assertEqual(self.request('/').content, b'replica1')
+
+    def test_outside_request_reads_primary(self):
+        """Команды и фоновые потоки всегда читают основную базу."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
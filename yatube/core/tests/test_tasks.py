@@ -0,0 +1,142 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts.models import Follow, Post, TimelineEntry
+
+from ..models import Task
+from ..tasks import claim, enqueue, purge, run_pending, task
+
+User = get_user_model()
+calls = []
+
+
+@task()
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=3)
+def flaky(fails):
+    calls.append(fails)
+    if len(calls) <= fails:
+        raise ValueError('сбой')
+
+
+@override_settings(TASKS_SYNC=False, TASK_RETRY_DELAY=0)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    @override_settings(TASKS_SYNC=True)
+    def test_sync_mode_runs_task_at_once(self):
+        """В синхронном режиме задача выполняется без очереди."""
+        enqueue(remember, 'сразу')
+        self.assertEqual(calls, ['сразу'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_key_makes_enqueue_idempotent(self):
+        """Задача с известным ключом не ставится повторно."""
+        self.assertTrue(enqueue(remember, 1, key='remember:1'))
+        self.assertFalse(enqueue(remember, 1, key='remember:1'))
+        enqueue(remember, 2)
+        enqueue(remember, 2)
+        self.assertEqual(calls, [])
+        self.assertEqual(run_pending(), 3)
+        self.assertEqual(sorted(calls), [1, 2, 2])
+        self.assertFalse(enqueue(remember, 1, key='remember:1'))
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE).count(), 3)
+
+    def test_failed_attempts_are_retried(self):
+        """Неудачная попытка повторяется, пока не кончатся попытки."""
+        enqueue(flaky, 1)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            run_pending()
+        item = Task.objects.get()
+        self.assertEqual((item.status, item.attempts), (Task.DONE, 2))
+        Task.objects.all().delete()
+        calls.clear()
+        enqueue(flaky, 5)
+        with self.assertLogs('core.tasks', 'ERROR') as logs:
+            run_pending()
+        self.assertEqual(len(logs.records), 3)
+        item = Task.objects.get()
+        self.assertEqual((item.status, item.attempts), (Task.FAILED, 3))
+        self.assertIn('сбой', item.last_error)
+
+    def test_failed_task_releases_its_key(self):
+        """Задачу с ключом можно поставить снова после неудачи,
+        старые завершённые задачи удаляются."""
+        enqueue(flaky, 5, key='flaky')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            run_pending()
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        calls.clear()
+        self.assertTrue(enqueue(flaky, 0, key='flaky'))
+        run_pending()
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        Task.objects.update(finished=timezone.now() - timedelta(days=30))
+        self.assertEqual(purge(), 1)
+
+    @override_settings(TASK_RETRY_DELAY=60)
+    def test_retry_waits_for_delay(self):
+        """Повтор ждёт паузу, а не выполняется сразу."""
+        enqueue(flaky, 5)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(run_pending(), 1)
+        item = Task.objects.get()
+        self.assertEqual(item.status, Task.PENDING)
+        self.assertGreater(item.run_at, timezone.now())
+
+    def test_abandoned_task_is_claimed_again(self):
+        """Задачу упавшего воркера забирают после TASK_LOCK_TIMEOUT."""
+        enqueue(remember, 'снова')
+        self.assertEqual(len(claim(10)), 1)
+        self.assertEqual(claim(10), [])
+        Task.objects.update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, ['снова'])
+        self.assertEqual(Task.objects.get().attempts, 2)
+
+    def test_follow_tasks_apply_current_state(self):
+        """Подписка и отписка подряд не оставляют записей в ленте,
+        в каком бы порядке ни выполнились их задачи."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Post.objects.create(text='Пост', author=author)
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.filter(user=reader, author=author).delete()
+        run_pending()
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_unfollows_in_one_run_backfill_timeline(self):
+        """Несколько отписок за один проход воркера опускают автора ниже
+        порога раскладки, и ленты оставшихся подписчиков дозаполняются."""
+        author = User.objects.create_user(username='author')
+        readers = [User.objects.create_user(username=f'reader{number}')
+                   for number in range(3)]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=author)
+        Post.objects.create(text='Пост', author=author)
+        run_pending()
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.filter(user__in=readers[:2]).delete()
+        run_pending()
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', flat=True)),
+            [readers[2].pk])
+
+    def test_run_workers_once(self):
+        """run_workers --once выполняет готовые задачи и завершается."""
+        enqueue(remember, 'команда')
+        out = StringIO()
+        call_command('run_workers', processes=0, once=True, stdout=out)
+        self.assertEqual(calls, ['команда'])
+        self.assertIn('1', out.getvalue())
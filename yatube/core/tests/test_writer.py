@@ -0,0 +1,64 @@
+from concurrent.futures import Future
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Post
+
+from ..db.writer import WriterQueue
+
+User = get_user_model()
+
+
+class WriterQueueTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.queue = WriterQueue(batch_size=10, delay=0.05)
+
+    def comment(self, text):
+        return Comment(post=self.post, author=self.author, text=text)
+
+    def test_writes_are_committed(self):
+        """Записи из очереди сохраняются, сигналы срабатывают."""
+        futures = [self.queue.submit(self.comment(f'К{number}').save)
+                   for number in range(5)]
+        for future in futures:
+            future.result(5)
+        self.assertEqual(Comment.objects.count(), 5)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 5)
+
+    def test_failed_write_does_not_cancel_batch(self):
+        """Ошибка одной записи не откатывает остальные в пачке."""
+        def fail():
+            raise ValueError('ошибка')
+
+        good = self.queue.submit(self.comment('Первый').save)
+        bad = self.queue.submit(fail)
+        other = self.queue.submit(self.comment('Второй').save)
+        good.result(5)
+        other.result(5)
+        with self.assertRaises(ValueError):
+            bad.result(5)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+
+    def test_retry_inserts_rolled_back_objects(self):
+        """После отката пачки новый объект вставляется заново, а не
+        обновляет строку по id, полученному в откатившейся пачке."""
+        def fail():
+            raise ValueError('ошибка')
+
+        comment = self.comment('Новый')
+        batch = [(comment.save, Future()), (fail, Future())]
+        with CaptureQueriesContext(connection) as queries:
+            self.queue.write(batch)
+        batch[0][1].result(0)
+        updates = [query for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE "posts_comment"')]
+        self.assertEqual(updates, [])
+        self.assertTrue(Comment.objects.filter(pk=comment.pk).exists())
@@ -0,0 +1,158 @@
+"""Письма-дайджесты о новых постах из подписок и комментариях.
+
+Новый пост автора и новый комментарий к посту записываются в
+``Notification`` для каждого получателя с адресом почты — задачами
+очереди ``core.tasks``, а не в запросе. События копятся до конца окна
+``DIGEST_WINDOW``: первое событие окна ставит на его конец одну задачу
+``send_digests`` (ключ окна делает постановку идемпотентной). Задача
+собирает одно письмо на получателя со всеми его событиями и отправляет
+письма через одно соединение почтового бэкенда пачками по
+``DIGEST_BATCH_SIZE``, не быстрее ``DIGEST_RATE`` писем в секунду.
+"""
+import math
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from core.tasks import enqueue, task
+from posts.models import Comment, Follow, Post
+
+from .models import Notification
+
+
+def schedule_sending():
+    """Ставит отправку на конец текущего окна."""
+    window = settings.DIGEST_WINDOW
+    now = time.time()
+    end = math.ceil(now / window) * window if window else now
+    enqueue(send_digests, key=f'notifications:digests:{int(end)}',
+            delay=end - now)
+
+
+def record(kind, recipients, **fields):
+    notifications = Notification.objects.bulk_create(
+        (Notification(kind=kind, recipient_id=pk, **fields)
+         for pk in recipients),
+        batch_size=settings.DIGEST_BATCH_SIZE,
+    )
+    if notifications:
+        schedule_sending()
+    return len(notifications)
+
+
+@task()
+def post_published(post_id):
+    """Задача: событие нового поста для подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).only('author_id').first()
+    if post is None:
+        return 0
+    followers = Follow.objects.filter(author_id=post.author_id).exclude(
+        user__email='').values_list('user_id', flat=True)
+    return record(Notification.NEW_POST, followers.iterator(),
+                  post_id=post_id)
+
+
+@task()
+def comment_added(comment_id):
+    """Задача: событие нового комментария для автора поста."""
+    comment = Comment.objects.filter(pk=comment_id).select_related(
+        'post__author').only(
+        'author_id', 'post__author__email').first()
+    if (comment is None or comment.author_id == comment.post.author_id
+            or not comment.post.author.email):
+        return 0
+    return record(Notification.NEW_COMMENT, [comment.post.author_id],
+                  post_id=comment.post_id, comment_id=comment_id)
+
+
+def post_url(post_id):
+    return settings.DIGEST_SITE_URL + reverse(
+        'posts:post_detail', kwargs={'post_id': post_id})
+
+
+def message(recipient, notifications):
+    """Письмо-дайджест ``recipient`` о событиях ``notifications``."""
+    shown = notifications[:settings.DIGEST_MAX_ITEMS]
+    items = [{
+        'kind': notification.kind,
+        'author': (notification.comment.author.username
+                   if notification.comment_id
+                   else notification.post.author.username),
+        'text': (notification.comment or notification.post).text,
+        'url': post_url(notification.post_id),
+    } for notification in shown]
+    body = render_to_string('notifications/digest.txt', {
+        'recipient': recipient,
+        'items': items,
+        'more': len(notifications) - len(shown),
+    })
+    subject = f'Yatube: новых событий — {len(notifications)}'
+    return EmailMessage(subject, body, to=[recipient.email])
+
+
+def pending_recipients(after, limit):
+    return list(Notification.objects.filter(
+        sent=None, recipient_id__gt=after).values_list(
+        'recipient_id', flat=True).distinct().order_by(
+        'recipient_id')[:limit])
+
+
+def claim(recipient_ids):
+    """Отмечает неотправленные события получателей отправленными и
+    возвращает время отметки — по нему пачка находит свои события."""
+    claimed_at = timezone.now()
+    Notification.objects.filter(
+        sent=None, recipient_id__in=recipient_ids).update(sent=claimed_at)
+    return claimed_at
+
+
+def build(recipient_ids, claimed_at):
+    """``(письма, id событий в них)`` для пачки из ``claim``."""
+    grouped = defaultdict(list)
+    notifications = Notification.objects.filter(
+        sent=claimed_at, recipient_id__in=recipient_ids).select_related(
+        'recipient', 'post__author', 'comment__author').order_by('pk')
+    for notification in notifications:
+        grouped[notification.recipient].append(notification)
+    messages = [message(recipient, items)
+                for recipient, items in grouped.items()]
+    ids = [item.pk for items in grouped.values() for item in items]
+    return messages, ids
+
+
+@task(atomic=False)
+def send_digests():
+    """Задача: отправляет накопленные события, одно письмо на
+    получателя; возвращает число писем.
+
+    Каждая пачка отмечается отправленной одним ``UPDATE`` до отправки,
+    а почта уходит и пауза ``DIGEST_RATE`` выдерживается вне транзакции:
+    запись в базу не ждёт SMTP. Если отправка пачки не удалась, отметка
+    снимается, и пачку с остальными повторит очередь; отправленные
+    раньше пачки уже отмечены и повторно не уйдут.
+    """
+    sent = 0
+    last = 0
+    with get_connection() as connection:
+        while True:
+            recipients = pending_recipients(last, settings.DIGEST_BATCH_SIZE)
+            if not recipients:
+                break
+            last = recipients[-1]
+            started = time.monotonic()
+            messages, ids = build(recipients, claim(recipients))
+            try:
+                connection.send_messages(messages)
+            except Exception:
+                Notification.objects.filter(pk__in=ids).update(sent=None)
+                raise
+            sent += len(messages)
+            if settings.DIGEST_RATE:
+                pause = len(messages) / settings.DIGEST_RATE
+                time.sleep(max(0, pause - (time.monotonic() - started)))
+    return sent
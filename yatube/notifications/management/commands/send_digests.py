@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.digests import send_digests
+
+
+class Command(BaseCommand):
+    help = ('Отправляет накопленные уведомления сразу, не дожидаясь конца '
+            'окна DIGEST_WINDOW: одно письмо на получателя.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        sent = send_digests()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Отправлено писем: {sent} за {elapsed:.2f} с'
+            + (f', {sent / elapsed:.0f} в секунду' if sent else ''))
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class Notification(models.Model):
+    """Событие, о котором получатель узнает из письма-дайджеста."""
+    NEW_POST = 'post'
+    NEW_COMMENT = 'comment'
+    KINDS = (
+        (NEW_POST, 'Новый пост автора из подписок'),
+        (NEW_COMMENT, 'Новый комментарий к посту'),
+    )
+
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель',
+    )
+    kind = models.CharField('Событие', max_length=10, choices=KINDS)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name='Комментарий',
+    )
+    created = models.DateTimeField('Дата события', auto_now_add=True)
+    sent = models.DateTimeField('Дата отправки', null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent', 'recipient'],
+                         name='notification_unsent_idx'),
+        ]
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.tasks import enqueue
+from posts.models import Comment, Post
+
+from . import digests
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(digests.post_published, instance.pk,
+                key=f'notifications:post:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(digests.comment_added, instance.pk,
+                key=f'notifications:comment:{instance.pk}')
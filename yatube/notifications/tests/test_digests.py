@@ -0,0 +1,135 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Task
+from core.tasks import run_pending
+from posts.models import Follow, Post
+
+from ..digests import send_digests
+from ..models import Notification
+
+User = get_user_model()
+
+
+class CountingBackend(EmailBackend):
+    """locmem, который считает открытые соединения и пачки."""
+    opened = 0
+    batches = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        CountingBackend.batches += 1
+        return super().send_messages(messages)
+
+
+class FailingBackend(EmailBackend):
+    """locmem, который не отправляет вторую пачку."""
+    batches = 0
+
+    def send_messages(self, messages):
+        FailingBackend.batches += 1
+        if FailingBackend.batches == 2:
+            raise ConnectionError('SMTP недоступен')
+        return super().send_messages(messages)
+
+
+class DigestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com')
+        cls.readers = [
+            User.objects.create_user(
+                username=f'reader{number}',
+                email=f'reader{number}@example.com')
+            for number in range(3)
+        ]
+        cls.silent = User.objects.create_user(username='silent')
+        for user in cls.readers + [cls.silent]:
+            Follow.objects.create(user=user, author=cls.author)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.readers[0])
+
+    def test_views_send_mail_in_sync_mode(self):
+        """Новый пост и комментарий сразу уходят письмами."""
+        self.author_client.post(reverse('posts:post_create'),
+                                {'text': 'Свежий пост'})
+        post = Post.objects.get(text='Свежий пост')
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         [reader.email for reader in self.readers])
+        self.assertIn('Свежий пост', mail.outbox[0].body)
+        self.assertIn(reverse('posts:post_detail', args=[post.pk]),
+                      mail.outbox[0].body)
+        mail.outbox.clear()
+        self.reader_client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Отличный пост'})
+        self.author_client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Спасибо'})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.author.email])
+        self.assertIn('Отличный пост', mail.outbox[0].body)
+
+    @override_settings(TASKS_SYNC=False)
+    def test_events_are_grouped_per_recipient(self):
+        """События окна уходят одним письмом на получателя и одной
+        задачей отправки."""
+        for number in range(3):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        self.assertEqual(len(mail.outbox), 0)
+        run_pending()
+        self.assertEqual(Notification.objects.count(), 9)
+        self.assertEqual(Task.objects.filter(
+            name='notifications.digests.send_digests').count(), 1)
+        self.assertEqual(send_digests(), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        for message in mail.outbox:
+            self.assertIn('новых событий — 3', message.subject)
+            for number in range(3):
+                self.assertIn(f'Пост {number}', message.body)
+        self.assertEqual(send_digests(), 0)
+        self.assertFalse(Notification.objects.filter(sent=None).exists())
+
+    @override_settings(
+        TASKS_SYNC=False, DIGEST_BATCH_SIZE=1, DIGEST_MAX_ITEMS=1,
+        EMAIL_BACKEND='notifications.tests.test_digests.CountingBackend')
+    def test_one_connection_for_all_batches(self):
+        """Все пачки писем уходят через одно соединение."""
+        Post.objects.create(text='Первый', author=self.author)
+        Post.objects.create(text='Второй', author=self.author)
+        run_pending()
+        CountingBackend.opened = CountingBackend.batches = 0
+        self.assertEqual(send_digests(), 3)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(CountingBackend.batches, 3)
+        self.assertIn('И ещё событий: 1', mail.outbox[0].body)
+
+    @override_settings(
+        TASKS_SYNC=False, DIGEST_WINDOW=0, DIGEST_BATCH_SIZE=1,
+        TASK_RETRY_DELAY=0,
+        EMAIL_BACKEND='notifications.tests.test_digests.FailingBackend')
+    def test_failed_batch_is_retried_alone(self):
+        """Сбой пачки не отменяет отметки уже отправленных: повтор
+        задачи досылает только остальное."""
+        FailingBackend.batches = 0
+        Post.objects.create(text='Пост', author=self.author)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            run_pending()
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [reader.email for reader in self.readers])
+        self.assertFalse(Notification.objects.filter(sent=None).exists())
+        self.assertEqual(Task.objects.get(
+            name='notifications.digests.send_digests').attempts, 2)
@@ -0,0 +1,279 @@
+"""Нагрузочный замер страниц постов на синтетических данных.
+
+``seed`` заполняет базу постами, комментариями и подписками с
+перекосом по Ципфу: немногие авторы пишут большую часть постов и
+собирают большую часть подписчиков. ``measure`` запрашивает каждую
+страницу тестовым клиентом и записывает число запросов, p50/p95
+времени ответа, пик памяти и стоимость повторного условного
+запроса с ``ETag``. Результаты сохраняются в JSON, и
+``compare`` находит регрессии между двумя прогонами.
+"""
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.core.cache import cache
+from django.db import OperationalError, connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, User
+from .transfer import Importer
+
+USER_PREFIX = 'bench'
+GROUP_PREFIX = 'bench-'
+
+
+@contextmanager
+def throwaway_database():
+    """Временная база с миграциями, которая удаляется после замера."""
+    creation = connection.creation
+    test_settings = connection.settings_dict['TEST']
+    if connection.vendor == 'sqlite' and not test_settings['NAME']:
+        # Базу в памяти SQLite нельзя закрыть между наборами данных, и
+        # потоки не делят с ней блокировки так, как с файлом
+        test_settings['NAME'] = os.path.join(
+            tempfile.gettempdir(), 'yatube_benchmark.sqlite3')
+    old_name = creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        creation.destroy_test_db(old_name, verbosity=0)
+
+
+def zipf_weights(size, skew):
+    """Накопленные веса рангов 1..size, вес ранга r — ``1 / r**skew``."""
+    return list(accumulate(1 / rank ** skew for rank in range(1, size + 1)))
+
+
+def synthetic_rows(posts, users, groups, follows_per_user, skew, seed=0):
+    """Строки в формате выгрузки ``posts.transfer``."""
+    rng = random.Random(seed)
+    weights = zipf_weights(users, skew)
+    usernames = [f'{USER_PREFIX}{number}' for number in range(users)]
+    slugs = [f'{GROUP_PREFIX}{number}' for number in range(groups)]
+    start = timezone.now() - timedelta(seconds=posts)
+    for number in range(1, posts + 1):
+        yield {
+            'type': 'post',
+            'id': number,
+            'author': rng.choices(usernames, cum_weights=weights)[0],
+            'group': rng.choice(slugs) if groups and number % 3 else None,
+            'text': f'Синтетический пост {number}',
+            'pub_date': (start + timedelta(seconds=number)).isoformat(),
+        }
+    # Комментарии тоже перекошены: больше всего их у самого первого поста
+    comment_weights = zipf_weights(posts, skew)
+    for number in range(1, posts // 10 + 1):
+        yield {
+            'type': 'comment',
+            'id': number,
+            'post': rng.choices(
+                range(1, posts + 1), cum_weights=comment_weights)[0],
+            'author': rng.choice(usernames),
+            'text': f'Комментарий {number}',
+            'pub_date': timezone.now().isoformat(),
+        }
+    for user in usernames:
+        authors = set(rng.choices(
+            usernames, cum_weights=weights, k=follows_per_user))
+        for author in authors - {user}:
+            yield {'type': 'follow', 'user': user, 'author': author}
+
+
+def seed(posts, users=5000, groups=20, follows_per_user=20, skew=1.1,
+         batch_size=2000):
+    """Заполняет базу и возвращает время загрузки в секундах."""
+    importer = Importer(batch_size, create_missing=True)
+    importer.run(synthetic_rows(
+        posts, users, groups, follows_per_user, skew))
+    # Статистика для планировщика и оценок числа записей, как в
+    # рабочей базе после автоматического ANALYZE
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return importer.elapsed
+
+
+def targets():
+    """Страницы для замера: самые тяжёлые представители каждого вида."""
+    author = User.objects.filter(
+        username__startswith=USER_PREFIX).order_by(
+        '-stats__posts_count').first()
+    reader = User.objects.filter(
+        username__startswith=USER_PREFIX).order_by(
+        '-stats__following_count').first()
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    urls = {
+        'index': reverse('posts:index'),
+        'index_deep': reverse('posts:index') + '?page=10',
+    }
+    if group is not None:
+        urls['group_posts'] = reverse('posts:groups', args=[group.slug])
+    if author is not None:
+        urls['profile'] = reverse('posts:profile', args=[author.username])
+    if post is not None:
+        urls['post_detail'] = reverse('posts:post_detail', args=[post.pk])
+    return urls, reader
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def timed_get(client, url, **headers):
+    """``(ответ, число запросов, время в мс)`` одного запроса."""
+    # request_started очищает журнал запросов, поэтому
+    # CaptureQueriesContext должен начинать с пустого журнала
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url, **headers)
+        elapsed = (time.perf_counter() - started) * 1000
+    return response, len(queries), elapsed
+
+
+def measure_url(client, url, repeat):
+    """Замер одной страницы: первый запрос — с пустым кэшем."""
+    cache.clear()
+    response, cold_queries, cold_ms = timed_get(client, url)
+    if response.status_code != 200:
+        raise RuntimeError(f'{url}: ответ {response.status_code}')
+    queries, timings = cold_queries, []
+    for _ in range(repeat):
+        _, queries, elapsed = timed_get(client, url)
+        timings.append(elapsed)
+    # Повторный визит клиента с ETag полного ответа
+    conditional = {}
+    if response.has_header('ETag'):
+        not_modified, conditional_queries, conditional_ms = timed_get(
+            client, url, HTTP_IF_NONE_MATCH=response['ETag'])
+        conditional = {
+            'conditional_status': not_modified.status_code,
+            'conditional_queries': conditional_queries,
+            'conditional_ms': round(conditional_ms, 2),
+            'bytes_saved': len(response.content),
+        }
+    # Память меряется отдельным запросом: tracemalloc искажает время
+    cache.clear()
+    tracemalloc.start()
+    try:
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'url': url,
+        'cold_queries': cold_queries,
+        'cold_ms': round(cold_ms, 2),
+        'queries': queries,
+        'p50_ms': round(statistics.median(timings), 2) if timings else None,
+        'p95_ms': round(percentile(timings, 0.95), 2) if timings else None,
+        'peak_kb': round(peak / 1024, 1),
+        **conditional,
+    }
+
+
+def measure(repeat=20):
+    """Замер всех страниц постов, ``follow_index`` — от самого
+    подписанного читателя."""
+    urls, reader = targets()
+    client = Client()
+    results = {name: measure_url(client, url, repeat)
+               for name, url in urls.items()}
+    if reader is not None:
+        client.force_login(reader)
+        results['follow_index'] = measure_url(
+            client, reverse('posts:follow_index'), repeat)
+    return results
+
+
+def dataset_info():
+    return {
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+    }
+
+
+def compare(baseline, current, tolerance=0.2):
+    """Регрессии ``current`` относительно ``baseline``.
+
+    Рост числа запросов — всегда регрессия; время и память — когда
+    выросли больше чем на ``tolerance``.
+    """
+    regressions = []
+    previous = {run['posts']: run['views'] for run in baseline['runs']}
+    for run in current['runs']:
+        for name, now in run['views'].items():
+            before = previous.get(run['posts'], {}).get(name)
+            if before is None:
+                continue
+            for metric in ('cold_queries', 'queries'):
+                if now[metric] > before[metric]:
+                    regressions.append(
+                        (run['posts'], name, metric, before[metric],
+                         now[metric]))
+            for metric in ('p95_ms', 'peak_kb'):
+                if before[metric] and now[metric] and (
+                        now[metric] > before[metric] * (1 + tolerance)):
+                    regressions.append(
+                        (run['posts'], name, metric, before[metric],
+                         now[metric]))
+    return regressions
+
+
+def comment_load(threads, writes, queue=None):
+    """Пишет комментарии из ``threads`` потоков по ``writes`` в каждом.
+
+    С ``queue`` (``WriterQueue``) потоки отдают запись писателю.
+    Возвращает число записей, ошибок блокировки и записей в секунду.
+    """
+    author, _ = User.objects.get_or_create(username=f'{USER_PREFIX}-writer')
+    post = Post.objects.create(text='Пост для комментариев', author=author)
+    done, errors = [], []
+
+    def worker():
+        try:
+            for number in range(writes):
+                comment = Comment(
+                    post_id=post.pk, author_id=author.pk,
+                    text=f'Комментарий {number}')
+                try:
+                    if queue is None:
+                        comment.save()
+                    else:
+                        queue.submit(comment.save).result()
+                except OperationalError as error:
+                    errors.append(error)
+                else:
+                    done.append(1)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'writes': len(done),
+        'errors': len(errors),
+        'writes_per_second': round(len(done) / elapsed, 1),
+    }
@@ -0,0 +1,217 @@
+"""Кэш лент и отрендеренных карточек постов.
+
+Карточка ``posts/card.html`` кэшируется по ключу из id поста и его
+версии ``Post.version``: правка поста, смена картинки или
+переименование группы поднимают версию, и старый фрагмент больше не
+читается. Лента собирается одним ``get_many`` по ключам страницы.
+
+Страница ленты кэшируется отдельно от рендеринга — как список id
+постов и состояние паджинатора. Ключ включает поколение ленты
+(общей, группы, автора), которое поднимается при каждой записи,
+поэтому устаревших страниц после публикации не бывает. Поколение и
+время последней записи служат и валидаторами условных запросов
+(``posts.conditional``).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import metrics
+from core.cache import incr, single_flight, unpack
+
+from .paginator import (
+    CountedPaginator, CursorPage, CursorPaginator, UncountedPage,
+    UncountedPaginator,
+)
+
+CARD_KEY = 'posts:card:{pk}:{version}:{stamp}:{variant}'
+CARD_HITS = 'posts:card:hits'
+CARD_MISSES = 'posts:card:misses'
+FEED_GENERATION_KEY = 'posts:feed:generation:{scope}'
+FEED_MODIFIED_KEY = 'posts:feed:modified:{scope}'
+FEED_PAGE_KEY = 'posts:feed:{scope}:{generation}:{position}'
+FEED_HITS = 'posts:feed:hits'
+FEED_MISSES = 'posts:feed:misses'
+
+
+def card_key(post, in_group):
+    # Время публикации защищает от совпадения id после пересоздания базы
+    return CARD_KEY.format(
+        pk=post.pk,
+        version=post.version,
+        stamp=int(post.pub_date.timestamp()),
+        variant='group' if in_group else 'feed',
+    )
+
+
+def render_cards(posts, group=None):
+    """HTML карточек ``posts`` по порядку: из кэша, недостающие рендерит.
+
+    Промах рендерится через ``single_flight``, чтобы новую карточку
+    не рендерили одновременно все воркеры.
+    """
+    posts = list(posts)
+    keys = [card_key(post, group is not None) for post in posts]
+    cached = cache.get_many(keys)
+    cards = []
+    misses = 0
+    for key, post in zip(keys, posts):
+        card, fresh = unpack(cached.get(key))
+        if not fresh:
+            misses += 1
+            card = single_flight(
+                key,
+                lambda post=post: render_to_string(
+                    'posts/card.html', {'post': post, 'group': group}),
+                settings.CARD_CACHE_TIMEOUT,
+            )
+        cards.append(mark_safe(card))
+    if len(keys) > misses:
+        incr(CARD_HITS, len(keys) - misses)
+        metrics.count('cache_hits', len(keys) - misses)
+    if misses:
+        incr(CARD_MISSES, misses)
+        metrics.count('cache_misses', misses)
+    return cards
+
+
+def _stats(hits_key, misses_key):
+    hits = cache.get(hits_key, 0)
+    misses = cache.get(misses_key, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def card_stats():
+    return _stats(CARD_HITS, CARD_MISSES)
+
+
+def feed_stats():
+    return _stats(FEED_HITS, FEED_MISSES)
+
+
+def feed_scopes(post, group_ids=None):
+    """Ленты, в которые попадает пост: общая, группы и автора."""
+    if group_ids is None:
+        group_ids = [post.group_id]
+    scopes = ['index', f'author:{post.author_id}']
+    scopes += [f'group:{pk}' for pk in group_ids if pk is not None]
+    return scopes
+
+
+def feed_generation(scope):
+    key = FEED_GENERATION_KEY.format(scope=scope)
+    generation = cache.get(key)
+    if generation is None:
+        # Начало с текущего времени не даёт совпасть со страницами,
+        # которые пережили вытеснение счётчика из кэша
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def feed_state(scope):
+    """``(поколение, время последней записи)`` ленты за одно чтение."""
+    keys = [FEED_GENERATION_KEY.format(scope=scope),
+            FEED_MODIFIED_KEY.format(scope=scope)]
+    generation, modified = (cache.get_many(keys).get(key) for key in keys)
+    if generation is None:
+        generation = feed_generation(scope)
+    if modified is None:
+        # Время записи неизвестно: считаем, что лента изменилась сейчас
+        cache.add(keys[1], int(time.time()), None)
+        modified = cache.get(keys[1])
+    return generation, modified
+
+
+def bump_feeds(scopes):
+    """Делает закэшированные страницы лент ``scopes`` недействительными.
+
+    Поколение поднимается сразу и ещё раз после коммита: страница,
+    собранная параллельным запросом до коммита, не переживёт его.
+    """
+    _bump_generations(scopes)
+    transaction.on_commit(lambda: _bump_generations(scopes))
+
+
+def _bump_generations(scopes):
+    cache.set_many({FEED_MODIFIED_KEY.format(scope=scope): int(time.time())
+                    for scope in scopes}, None)
+    for scope in scopes:
+        try:
+            cache.incr(FEED_GENERATION_KEY.format(scope=scope))
+        except ValueError:
+            feed_generation(scope)
+
+
+def freeze_page(page):
+    """Состояние страницы без объектов: id постов и навигация."""
+    state = {
+        'ids': [post.pk for post in page],
+        'next_cursor': page.next_cursor,
+    }
+    if getattr(page, 'is_cursor', False):
+        state['previous_cursor'] = page.previous_cursor
+    else:
+        state['number'] = page.number
+        state['count'] = page.paginator.count
+        if state['count'] is None:
+            state['has_next'] = page.has_next()
+    return state
+
+
+def thaw_page(state, post_list):
+    """Страница из ``freeze_page``: посты читаются заново по id."""
+    posts = post_list.in_bulk(state['ids'])
+    posts = [posts[pk] for pk in state['ids'] if pk in posts]
+    if 'number' not in state:
+        return CursorPage(
+            posts, CursorPaginator(post_list, settings.MAX_POSTS),
+            state['next_cursor'], state['previous_cursor'])
+    if state['count'] is None:
+        page = UncountedPage(
+            posts, state['number'],
+            UncountedPaginator(post_list, settings.MAX_POSTS),
+            state['has_next'])
+    else:
+        paginator = CountedPaginator(
+            post_list, settings.MAX_POSTS, count=state['count'])
+        page = Page(posts, state['number'], paginator)
+    page.next_cursor = state['next_cursor']
+    return page
+
+
+def cached_feed_page(scope, post_list, request, paginate):
+    """Страница ленты ``scope`` из кэша или от ``paginate()``."""
+    kind = scope.split(':')[0]
+    if kind not in settings.FEED_CACHE_SCOPES:
+        return paginate()
+    position = request.GET.get('cursor')
+    if position is None:
+        page = request.GET.get('page', '1')
+        position = 'page:' + (page if page.isdigit() else '1')
+    key = FEED_PAGE_KEY.format(
+        scope=scope, generation=feed_generation(scope), position=position)
+    built = []
+
+    def build():
+        built.append(paginate())
+        return freeze_page(built[0])
+
+    state = single_flight(key, build, settings.FEED_CACHE_TIMEOUT)
+    if built:
+        incr(FEED_MISSES)
+        metrics.count('cache_misses')
+        return built[0]
+    incr(FEED_HITS)
+    metrics.count('cache_hits')
+    return thaw_page(state, post_list)
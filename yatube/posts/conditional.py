@@ -0,0 +1,71 @@
+"""Условные GET-запросы к страницам постов.
+
+Страница отвечает ``304 Not Modified`` без запроса постов и без
+рендеринга, если клиент прислал её текущий ``ETag`` (или
+``If-Modified-Since`` не раньше последней записи в ленту). Валидаторы
+собираются из дешёвых данных, которые представлению нужны и так:
+поколения ленты из ``posts.cache``, версии поста, счётчиков. К ним
+всегда добавляются пользователь (шапка и кнопки зависят от него) и
+полный адрес с курсором или номером страницы.
+
+Размер и время рендеринга последнего полного ответа запоминаются по
+его ``ETag``, поэтому каждый ``304`` записывает в метрики запроса,
+сколько байт и миллисекунд он сэкономил.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core import metrics
+
+from .cache import feed_state
+
+RESPONSE_KEY = 'posts:conditional:{etag}'
+
+
+def make_etag(request, *parts):
+    value = ':'.join(str(part) for part in (
+        *parts, request.user.pk, request.get_full_path()))
+    return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+
+def feed_validators(scope, *parts):
+    """``(части ETag, Last-Modified)`` страницы ленты ``scope`` или
+    ``(None, None)``, если валидаторы по поколениям выключены."""
+    if not settings.FEED_VALIDATORS:
+        return None, None
+    generation, modified = feed_state(scope)
+    return (scope, generation, *parts), modified
+
+
+def render_conditional(request, template_name, get_context, etag_parts,
+                       last_modified=None):
+    """``render`` с валидаторами: ``get_context()`` вызывается, только
+    если у клиента нет актуальной копии страницы. Без ``etag_parts``
+    страница просто рендерится."""
+    if etag_parts is None:
+        return render(request, template_name, get_context())
+    etag = make_etag(request, *etag_parts)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    key = RESPONSE_KEY.format(etag=etag)
+    if response is None:
+        started = time.perf_counter()
+        response = render(request, template_name, get_context())
+        elapsed = round((time.perf_counter() - started) * 1000)
+        cache.set(key, (len(response.content), elapsed),
+                  settings.FEED_CACHE_TIMEOUT)
+    elif response.status_code == 304:
+        size, elapsed = cache.get(key, (0, 0))
+        metrics.count('not_modified')
+        metrics.count('bytes_saved', size)
+        metrics.count('render_ms_saved', elapsed)
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
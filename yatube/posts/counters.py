@@ -0,0 +1,113 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Инкременты делаются ``UPDATE ... SET n = n + 1`` через ``F()``, поэтому
+параллельные запросы не теряют обновления. Точные значения
+восстанавливает ``recount`` (``manage.py recount``).
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def shift(name, delta):
+    """``name + delta``, но не меньше нуля: поля счётчиков беззнаковые."""
+    if delta < 0:
+        return Greatest(F(name) + delta, 0)
+    return F(name) + delta
+
+
+def bump_user(user_id, **deltas):
+    """Меняет счётчики ``UserStats``.
+
+    Если строки ещё нет, при росте счётчика она создаётся пересчётом;
+    уменьшение без строки пропускается — так бывает при каскадном
+    удалении самого пользователя.
+    """
+    with transaction.atomic():
+        updated = UserStats.objects.filter(user_id=user_id).update(
+            **{name: shift(name, delta) for name, delta in deltas.items()})
+        if not updated and any(delta > 0 for delta in deltas.values()):
+            recount_users(User.objects.filter(pk=user_id))
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=shift('posts_count', delta))
+
+
+def bump_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=shift('comments_count', delta))
+
+
+def count_of(model, field):
+    """Подзапрос: сколько строк ``model`` ссылаются на внешнюю строку."""
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def recount_users(users=None):
+    """Пересчитывает ``UserStats``; возвращает число исправленных строк."""
+    users = (User.objects.all() if users is None else users).annotate(
+        real_posts=count_of(Post, 'author'),
+        real_followers=count_of(Follow, 'author'),
+        real_following=count_of(Follow, 'user'),
+    ).select_related('stats')
+    fixed = 0
+    for user in users.iterator():
+        values = {
+            'posts_count': user.real_posts,
+            'followers_count': user.real_followers,
+            'following_count': user.real_following,
+        }
+        stats, created = UserStats.objects.get_or_create(
+            user_id=user.pk, defaults=values)
+        if created:
+            fixed += 1
+        elif any(getattr(stats, name) != value
+                 for name, value in values.items()):
+            UserStats.objects.filter(user_id=user.pk).update(**values)
+            fixed += 1
+    return fixed
+
+
+def user_stats(user):
+    """``UserStats`` пользователя ``user``.
+
+    Строки может не быть у пользователей из ``loaddata``,
+    ``bulk_create`` или импорта — тогда она создаётся пересчётом.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_users(User.objects.filter(pk=user.pk))
+        user.stats = UserStats.objects.get(user_id=user.pk)
+        return user.stats
+
+
+def _recount(queryset, field, real):
+    mismatched = queryset.annotate(real=real).exclude(
+        **{field: F('real')}).values_list('pk', 'real')
+    fixed = 0
+    for pk, value in mismatched.iterator():
+        fixed += queryset.filter(pk=pk).update(**{field: value})
+    return fixed
+
+
+def recount_groups(groups=None):
+    return _recount(Group.objects.all() if groups is None else groups,
+                    'posts_count', count_of(Post, 'group'))
+
+
+def recount_posts(posts=None):
+    return _recount(Post.objects.all() if posts is None else posts,
+                    'comments_count', count_of(Comment, 'post'))
@@ -0,0 +1,65 @@
+"""Приблизительный подсчёт записей больших лент.
+
+Точный ``COUNT(*)`` по большой таблице дороже чтения страницы, а для
+номеров страниц хватает оценки. Сначала записи считаются с пределом
+``PAGINATOR_EXACT_COUNT_LIMIT`` — небольшие ленты получают точное
+число за ограниченное время. Если предел превышен, число берётся из
+статистики планировщика (``sqlite_stat1`` после ``ANALYZE`` в SQLite,
+``pg_class.reltuples`` в PostgreSQL) для ленты без фильтров или из
+кэша, где точный подсчёт живёт ``COUNT_CACHE_TIMEOUT`` секунд.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from core.cache import single_flight
+
+COUNT_KEY = 'posts:count:{digest}'
+
+
+def table_estimate(model, using='default'):
+    """Число строк таблицы по статистике базы или ``None``."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        # Первое число stat — строки таблицы (или индекса по ней)
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # В SQLite таблицы статистики нет, пока не выполнен ANALYZE
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+def cached_count(queryset):
+    """Точное число записей, закэшированное по тексту запроса."""
+    digest = hashlib.md5(str(queryset.query).encode()).hexdigest()
+    return single_flight(COUNT_KEY.format(digest=digest), queryset.count,
+                         settings.COUNT_CACHE_TIMEOUT)
+
+
+def estimate_count(queryset):
+    """``(число записей, оценка ли это)`` для ``queryset``."""
+    limit = settings.PAGINATOR_EXACT_COUNT_LIMIT
+    queryset = queryset.order_by()
+    bounded = queryset[:limit + 1].count()
+    if bounded <= limit:
+        return bounded, False
+    estimate = None
+    if not queryset.query.where:
+        estimate = table_estimate(queryset.model, queryset.db)
+    if estimate is None:
+        estimate = cached_count(queryset)
+    # Статистика могла устареть, но записей не меньше, чем насчитано
+    return max(estimate, bounded), True
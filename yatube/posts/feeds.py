@@ -0,0 +1,158 @@
+"""Ленты постов для агрегаторов: RSS 2.0, Atom и JSON Feed.
+
+Агрегаторы опрашивают ленты часто, поэтому ответ без изменений стоит
+двух лёгких запросов: ``ETag`` строится из времени самого нового
+поста и поколения ленты из ``posts.cache`` (оно поднимается при
+публикации, правке и удалении поста), ``Last-Modified`` — время
+самого нового поста. При совпадении отдаётся ``304`` без чтения
+постов. Иначе посты читаются только с нужными полями и отдаются
+``StreamingHttpResponse`` по мере выборки. Без ``FEED_VALIDATORS``
+(поколения не общие для процессов) лента всегда отдаётся целиком.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.html import escape
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+
+from .cache import feed_generation
+
+FORMATS = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+FIELDS = ('pk', 'text', 'pub_date', 'author__username',
+          'author__first_name', 'author__last_name')
+
+
+class Feed:
+    """Лента ``post_list`` с заголовком ``title`` и страницей ``link``."""
+
+    def __init__(self, request, scope, title, link, post_list):
+        self.request = request
+        self.scope = scope
+        self.title = title
+        self.link = request.build_absolute_uri(link)
+        self.url = request.build_absolute_uri(request.path)
+        self.post_list = post_list.order_by('-pub_date', '-pk')
+
+    def updated(self):
+        """Время самого нового поста или ``None`` для пустой ленты."""
+        return self.post_list.values_list('pub_date', flat=True).first()
+
+    def etag(self, format, updated):
+        stamp = updated.timestamp() if updated else 0
+        value = f'{format}:{stamp}:{feed_generation(self.scope)}'
+        return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+    def response(self):
+        format = self.request.GET.get('format', 'rss')
+        if format not in FORMATS:
+            format = 'rss'
+        updated = self.updated()
+        etag = last_modified = response = None
+        if settings.FEED_VALIDATORS:
+            etag = self.etag(format, updated)
+            last_modified = int(updated.timestamp()) if updated else None
+            response = get_conditional_response(
+                self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            # Запрос выполняется при отдаче ответа, когда middleware
+            # уже отработали, поэтому база выбирается заранее
+            posts = self.post_list.using(self.post_list.db).select_related(
+                'author').only(*FIELDS)[:settings.FEED_ITEMS]
+            response = StreamingHttpResponse(
+                getattr(self, format)(posts.iterator(), updated),
+                content_type=FORMATS[format])
+        if etag is not None:
+            response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def entry(self, post):
+        return {
+            'url': self.request.build_absolute_uri(
+                reverse('posts:post_detail', args=[post.pk])),
+            'title': escape(Truncator(post.text).chars(50)),
+            'text': escape(post.text),
+            'author': escape(
+                post.author.get_full_name() or post.author.username),
+        }
+
+    def rss(self, posts, updated):
+        yield (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<rss version="2.0"><channel>'
+            f'<title>{escape(self.title)}</title>'
+            f'<link>{escape(self.link)}</link>'
+            f'<description>{escape(self.title)}</description>')
+        if updated:
+            yield f'<lastBuildDate>{rfc2822_date(updated)}</lastBuildDate>'
+        for post in posts:
+            entry = self.entry(post)
+            yield (
+                '<item>'
+                f'<title>{entry["title"]}</title>'
+                f'<link>{entry["url"]}</link>'
+                f'<guid>{entry["url"]}</guid>'
+                f'<description>{entry["text"]}</description>'
+                f'<author>{entry["author"]}</author>'
+                f'<pubDate>{rfc2822_date(post.pub_date)}</pubDate>'
+                '</item>')
+        yield '</channel></rss>\n'
+
+    def atom(self, posts, updated):
+        yield (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>{escape(self.title)}</title>'
+            f'<id>{escape(self.url)}</id>'
+            f'<link href="{escape(self.link)}"/>'
+            f'<link href="{escape(self.url)}" rel="self"/>'
+            f'<updated>{rfc3339_date(updated) if updated else ""}'
+            '</updated>')
+        for post in posts:
+            entry = self.entry(post)
+            yield (
+                '<entry>'
+                f'<title>{entry["title"]}</title>'
+                f'<link href="{entry["url"]}"/>'
+                f'<id>{entry["url"]}</id>'
+                f'<updated>{rfc3339_date(post.pub_date)}</updated>'
+                f'<author><name>{entry["author"]}</name></author>'
+                f'<content type="text">{entry["text"]}</content>'
+                '</entry>')
+        yield '</feed>\n'
+
+    def json(self, posts, updated):
+        header = json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': self.title,
+            'home_page_url': self.link,
+            'feed_url': self.url,
+        }, ensure_ascii=False)
+        yield header[:-1] + ', "items": ['
+        separator = ''
+        for post in posts:
+            item = json.dumps({
+                'id': str(post.pk),
+                'url': self.request.build_absolute_uri(
+                    reverse('posts:post_detail', args=[post.pk])),
+                'content_text': post.text,
+                'date_published': post.pub_date.isoformat(),
+                'authors': [{
+                    'name': (post.author.get_full_name()
+                             or post.author.username),
+                }],
+            }, ensure_ascii=False)
+            yield separator + item
+            separator = ', '
+        yield ']}\n'
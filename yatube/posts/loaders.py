@@ -0,0 +1,61 @@
+"""Загрузчики данных страниц с ограниченным числом запросов.
+
+Каждый загрузчик собирает контекст страницы так, что число запросов
+не зависит ни от размера страницы, ни от числа постов автора.
+"""
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.shortcuts import get_object_or_404
+
+from .counters import user_stats
+from .models import Follow, Post, User
+
+
+def load_author(request, username):
+    """Автор профиля со счётчиками ``UserStats`` и признаком подписки
+    текущего пользователя ``is_followed`` — одним запросом."""
+    if request.user.is_authenticated:
+        following = Exists(Follow.objects.filter(
+            user=request.user, author=OuterRef('pk')))
+    else:
+        following = Value(False, output_field=BooleanField())
+    return get_object_or_404(
+        User.objects.select_related('stats').annotate(is_followed=following),
+        username=username,
+    )
+
+
+def load_profile(author, paginate):
+    """Контекст профиля ``author`` из ``load_author`` за один запрос.
+
+    Запрос читает страницу постов; их число для паджинатора берётся
+    из счётчика, без ``COUNT(*)``. ``paginate(scope, post_list,
+    count)`` возвращает страницу ленты ``scope``.
+    """
+    post_count = user_stats(author).posts_count
+    post_list = author.posts.select_related('author', 'group')
+    return {
+        'author': author,
+        'post_count': post_count,
+        'following': author.is_followed,
+        'page_obj': paginate(f'author:{author.pk}', post_list, post_count),
+    }
+
+
+def load_post(post_id):
+    """Пост с автором, счётчиками автора и группой — одним запросом."""
+    return get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+
+
+def load_post_detail(post, paginate):
+    """Контекст страницы поста ``post`` из ``load_post`` за один запрос.
+
+    Число постов автора берётся из счётчика, без ``COUNT(*)``.
+    ``paginate(comment_list)`` возвращает страницу комментариев, их
+    авторы читаются тем же запросом.
+    """
+    return {
+        'post': post,
+        'post_count': user_stats(post.author).posts_count,
+        'comments': paginate(post.comments.select_related('author')),
+    }
@@ -0,0 +1,102 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from posts import benchmark
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True, cwd=settings.BASE_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу синтетическими постами и замеряет '
+            'запросы, время и память страниц постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, nargs='+', default=[10000, 100000],
+            help='Размеры наборов данных, например 10000 100000 1000000.')
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument(
+            '--follows-per-user', type=int, default=20,
+            help='Сколько подписок выбирает каждый пользователь.')
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель распределения Ципфа для авторов и подписок.')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз запрашивать каждую страницу.')
+        parser.add_argument(
+            '--cache', choices=sorted(settings.CACHE_BACKENDS),
+            default='locmem',
+            help='Кэш на время замера; он очищается между страницами.')
+        parser.add_argument('--output', help='Куда сохранить JSON.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p95 и памяти при сравнении.')
+
+    def handle(self, *args, **options):
+        report = {
+            'revision': git_revision(),
+            'date': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'vendor': connection.vendor,
+            'cache': options['cache'],
+            'runs': [],
+        }
+        caches = {'default': settings.CACHE_BACKENDS[options['cache']]}
+        for posts in options['posts']:
+            with override_settings(CACHES=caches):
+                report['runs'].append(self.run(posts, options))
+        result = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(result + '\n')
+        else:
+            self.stdout.write(result)
+        if options['compare']:
+            self.compare(options['compare'], report, options['tolerance'])
+
+    def run(self, posts, options):
+        """Один набор данных во временной базе, которая потом удаляется."""
+        with benchmark.throwaway_database():
+            seconds = benchmark.seed(
+                posts, options['users'], options['groups'],
+                options['follows_per_user'], options['skew'])
+            self.stderr.write(f'{posts} постов загружено за {seconds:.1f} с')
+            views = benchmark.measure(options['repeat'])
+            run = dict(benchmark.dataset_info(), seed_seconds=round(
+                seconds, 1), views=views)
+        for name, view in views.items():
+            self.stderr.write(
+                '{name}: запросов {queries} (без кэша {cold_queries}), '
+                'p50 {p50_ms} мс, p95 {p95_ms} мс, '
+                'память {peak_kb} КБ'.format(name=name, **view))
+        return run
+
+    def compare(self, path, report, tolerance):
+        with open(path, encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        regressions = benchmark.compare(baseline, report, tolerance)
+        for posts, name, metric, before, now in regressions:
+            self.stderr.write(f'{posts} постов, {name}: {metric} '
+                              f'{before} -> {now}')
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
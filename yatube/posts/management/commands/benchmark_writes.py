@@ -0,0 +1,54 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.db.writer import WriterQueue
+from posts import benchmark
+
+MODES = {
+    # Журнал по умолчанию: писатели и читатели блокируют друг друга
+    'default': ({'journal_mode': 'delete'}, False),
+    'concurrent': (settings.SQLITE_PRAGMAS, True),
+}
+
+
+class Command(BaseCommand):
+    help = ('Замеряет записи комментариев в секунду из нескольких потоков '
+            'в обычном режиме SQLite и в режиме WAL с очередью записи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--writes', type=int, default=200,
+            help='Сколько комментариев пишет каждый поток.')
+        parser.add_argument(
+            '--json', action='store_true', help='Вывести результат в JSON.')
+
+    def handle(self, *args, **options):
+        results = {}
+        with benchmark.throwaway_database():
+            options_dict = connections['default'].settings_dict['OPTIONS']
+            saved = dict(options_dict)
+            try:
+                for mode, (pragmas, queued) in MODES.items():
+                    # Новые соединения потоков откроются с прагмами режима
+                    options_dict['pragmas'] = pragmas
+                    connections.close_all()
+                    queue = WriterQueue(
+                        settings.WRITER_QUEUE_BATCH_SIZE,
+                        settings.WRITER_QUEUE_DELAY) if queued else None
+                    results[mode] = benchmark.comment_load(
+                        options['threads'], options['writes'], queue)
+            finally:
+                options_dict.clear()
+                options_dict.update(saved)
+                connections.close_all()
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, result in results.items():
+            self.stdout.write(
+                '{mode}: {writes} записей, {writes_per_second} в секунду, '
+                'ошибок блокировки {errors}'.format(mode=mode, **result))
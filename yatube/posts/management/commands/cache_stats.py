@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import card_stats, feed_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша лент и карточек постов.'
+
+    def handle(self, *args, **options):
+        for name, stats in (('Ленты', feed_stats()),
+                            ('Карточки', card_stats())):
+            self.stdout.write(
+                '{name}: попаданий {hits}, промахов {misses}, '
+                'доля попаданий {hit_rate:.1%}'.format(name=name, **stats))
@@ -0,0 +1,89 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Post, TimelineEntry
+from posts.paginator import seek_condition
+
+FEED_ORDERING = ('-pub_date', '-pk')
+SCAN_LINE = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+# Сортировка всей выборки вместо чтения в порядке индекса
+SORT_LINE = {
+    'sqlite': re.compile(r'\bUSE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+    'postgresql': re.compile(r'\bSort Key:'),
+}
+
+
+def full_scans(plan, vendor):
+    """Таблицы, которые план читает целиком, без индекса."""
+    scan_line = SCAN_LINE[vendor]
+    for line in plan.splitlines():
+        match = scan_line.search(line)
+        if match and 'USING' not in line:
+            yield match.group(1)
+
+
+def sorts(plan, vendor):
+    """Есть ли в плане сортировка без индекса."""
+    return bool(SORT_LINE[vendor].search(plan))
+
+
+def feed_queries():
+    """Запросы лент в том виде, в каком их выполняют представления."""
+    key = (timezone.now(), 0)
+    posts = Post.objects.select_related('author', 'group').order_by(
+        *FEED_ORDERING)
+    seek = seek_condition(FEED_ORDERING, key)
+    limit = settings.MAX_POSTS + 1
+    return {
+        'index': posts[:limit],
+        'index (cursor)': posts.filter(seek)[:limit],
+        'group_posts': posts.filter(group_id=0)[:limit],
+        'group_posts (cursor)': posts.filter(group_id=0).filter(seek)[:limit],
+        'profile': posts.filter(author_id=0)[:limit],
+        'profile (cursor)': posts.filter(author_id=0).filter(seek)[:limit],
+        'follow_index': TimelineEntry.objects.filter(user_id=0)
+        .select_related('post__author', 'post__group')
+        .order_by('-pub_date', '-post_id')[:limit],
+        # Номерная страница TimelinePosts и посты автора без раскладки
+        'follow_index (page 2)': TimelineEntry.objects.filter(user_id=0)
+        .select_related('post__author', 'post__group')
+        .order_by('-pub_date', '-post_id')[
+            settings.MAX_POSTS:2 * settings.MAX_POSTS],
+        'follow_index (celebrity)': posts.filter(author_id__in=[0])[:limit],
+        'follow state': Follow.objects.filter(user_id=0, author_id=0),
+        'post_detail comments': Comment.objects.filter(post_id=0)
+        .select_related('author')
+        .order_by('pub_date', 'pk')[:settings.COMMENTS_PER_PAGE + 1],
+    }
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для запросов лент и падает, если в плане '
+            'есть полный просмотр таблицы или сортировка без индекса.')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SCAN_LINE:
+            raise CommandError(
+                f'План запросов для {connection.vendor} не разбирается.')
+        failed = []
+        for name, queryset in feed_queries().items():
+            plan = queryset.explain()
+            tables = list(full_scans(plan, connection.vendor))
+            self.stdout.write(f'== {name}')
+            self.stdout.write(plan)
+            if tables:
+                failed.append(f'{name}: полный просмотр {", ".join(tables)}')
+            if sorts(plan, connection.vendor):
+                failed.append(f'{name}: сортировка без индекса')
+        if failed:
+            raise CommandError(
+                'Запросы лент без индекса: ' + '; '.join(failed))
+        self.stdout.write(self.style.SUCCESS(
+            'Все запросы лент используют индексы.'))
@@ -0,0 +1,37 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import WRITERS, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии и подписки в JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию stdout.')
+        parser.add_argument(
+            '--format', choices=sorted(WRITERS), default='jsonl')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stream = (sys.stdout if options['path'] == '-'
+                  else open(options['path'], 'w', encoding='utf-8',
+                            newline=''))
+        try:
+            rows = WRITERS[options['format']](
+                export_rows(options['chunk_size']), stream)
+            total = sum(1 for _ in rows)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            f'Выгружено строк: {total} за {elapsed:.1f} с '
+            f'({total / elapsed if elapsed else 0:.0f} строк/с)')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate, stored_urls
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры картинок постов.'
+
+    def handle(self, *args, **options):
+        built = 0
+        posts = Post.objects.exclude(image='').exclude(image=None).only(
+            'pk', 'image', 'thumbnails')
+        for post in posts.iterator():
+            if not stored_urls(post):
+                built += generate(post.pk, post.image.name)
+        self.stdout.write(f'Построены миниатюры для постов: {built}')
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import READERS, Importer
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты, комментарии и подписки из JSONL или CSV '
+            'пачками через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию stdin.')
+        parser.add_argument(
+            '--format', choices=sorted(READERS), default='jsonl')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк вставлять одним запросом.')
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать отсутствующих авторов и группы.')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        stream = (sys.stdin if options['path'] == '-'
+                  else open(options['path'], encoding='utf-8', newline=''))
+        importer = Importer(options['batch_size'], options['create_missing'])
+        try:
+            importer.run(READERS[options['format']](stream),
+                         progress=self.progress)
+        except LookupError as error:
+            raise CommandError(error)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        imported = importer.imported
+        self.stdout.write(
+            f'Загружено постов: {imported["post"]}, '
+            f'комментариев: {imported["comment"]}, '
+            f'подписок: {imported["follow"]} за {importer.elapsed:.1f} с '
+            f'({importer.throughput():.0f} строк/с)')
+
+    def progress(self, importer):
+        if self.verbosity > 1:
+            self.stdout.write(f'... {importer.total} строк')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Восстанавливает триггеры полнотекстового индекса постов и '
+            'перестраивает его.')
+
+    def handle(self, *args, **options):
+        if not search.ensure_index():
+            search.rebuild()
+        self.stdout.write('Поисковый индекс перестроен.')
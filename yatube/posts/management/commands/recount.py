@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок.'
+
+    def handle(self, *args, **options):
+        fixed = {
+            'пользователей': counters.recount_users(),
+            'групп': counters.recount_groups(),
+            'постов': counters.recount_posts(),
+        }
+        for name, count in fixed.items():
+            self.stdout.write(f'Исправлено счётчиков {name}: {count}')
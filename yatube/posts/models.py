@@ -12,12 +12,22 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Количество постов', default=0, editable=False)
 
 
 class Post(CreatedModel):
     def __str__(self):
         return f'{self.text[:15]}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа на момент загрузки: нужна счётчикам при смене группы
+        if 'group_id' in instance.__dict__:
+            instance._loaded_group_id = instance.group_id
+        return instance
+
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -44,9 +54,23 @@ class Post(CreatedModel):
         blank=True,
         null=True,
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0, editable=False)
+    version = models.PositiveIntegerField(
+        'Версия', default=1, editable=False)
+    thumbnails = models.TextField(
+        'Миниатюры', blank=True, default='', editable=False)
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -76,6 +100,12 @@ class Comment(models.Model):
         db_index=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'], name='comment_post_date_idx'),
+        ]
+
 
 class Follow (models.Model):
     user = models.ForeignKey(
@@ -91,3 +121,63 @@ class Follow (models.Model):
         related_name='following',
         verbose_name='Автор',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Обновляются сигналами при создании и удалении постов и подписок,
+    пересчитываются командой ``recount``.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Количество постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0)
+    following_count = models.PositiveIntegerField(
+        'Количество подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'),
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Лента подписок'
@@ -0,0 +1,290 @@
+import json
+from types import SimpleNamespace
+
+from django.core.paginator import (
+    EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator,
+)
+from django.db.models import Q, QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .counting import estimate_count
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или не подходит к ленте."""
+
+
+class CursorPage(Page):
+    """Страница ленты, полученная по курсору.
+
+    Номер страницы и общее количество записей неизвестны: соседние
+    страницы доступны только через ``next_cursor`` и ``previous_cursor``.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CountedPaginator(Paginator):
+    """Paginator с заранее известным числом записей, без ``COUNT(*)``."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+class EstimatedPaginator(Paginator):
+    """Paginator с оценкой числа записей из ``counting.estimate_count``.
+
+    Кроме ``QuerySet`` принимает ленту с методом ``querysets()``: число
+    её записей — сумма оценок источников.
+
+    Если оценка завысила число записей и страница оказалась пустой,
+    записи пересчитываются точно, чтобы навигация вела на последнюю
+    настоящую страницу.
+    """
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            querysets = [self.object_list]
+        else:
+            # Ленты не из одного запроса (TimelinePosts) оцениваются
+            # по своим источникам
+            querysets = self.object_list.querysets()
+        estimates = [estimate_count(queryset) for queryset in querysets]
+        self.estimated = any(estimated for _, estimated in estimates)
+        return sum(count for count, _ in estimates)
+
+    def page(self, number):
+        page = super().page(number)
+        if (page.number > 1 and getattr(self, 'estimated', False)
+                and not page.object_list):
+            self.count, self.estimated = self.object_list.count(), False
+            self.__dict__.pop('num_pages', None)
+            return super().page(number)
+        return page
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            return self.page(self.num_pages)
+
+
+class UncountedPage(Page):
+    """Страница ``UncountedPaginator``: известно только, есть ли следующая."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class UncountedPaginator(Paginator):
+    """Постраничный режим без ``COUNT(*)``.
+
+    Страница читается с одной лишней записью — по ней видно, есть ли
+    следующая. Число записей и страниц неизвестно: ``count`` и
+    ``num_pages`` равны ``None``.
+    """
+    count = None
+    num_pages = None
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На странице нет записей')
+        return UncountedPage(rows[:self.per_page], number, self,
+                             len(rows) > self.per_page)
+
+    def get_page(self, number):
+        """Как ``Paginator.get_page``; за концом ленты — первая страница."""
+        try:
+            return self.page(number)
+        except InvalidPage:
+            return self.page(1)
+
+
+def page_window(page, size, limit=None):
+    """Номера страниц для навигации по ``page``.
+
+    Первая, последняя и по ``size`` страниц вокруг текущей; ``None`` —
+    пропуск. Без известного числа страниц окно заканчивается
+    следующей страницей и пропуском, если она есть. Номера больше
+    ``limit`` не показываются: туда лента ведёт курсором.
+    """
+    last = page.paginator.num_pages
+    known = last is not None
+    if not known:
+        last = page.number + 1 if page.has_next() else page.number
+    if limit is not None and last > limit:
+        last, known = limit, False
+    numbers = {1, last} | set(range(
+        max(1, page.number - size), min(last, page.number + size) + 1))
+    window, previous = [], 0
+    for number in sorted(numbers):
+        if number - previous > 1:
+            window.append(None)
+        window.append(number)
+        previous = number
+    if not known and page.has_next():
+        window.append(None)
+    return window
+
+
+class CursorPaginator(Paginator):
+    """Keyset-паджинатор: страница выбирается условием по ключу сортировки.
+
+    Вместо ``LIMIT/OFFSET`` ищет записи строго после (или до) ключа
+    последней показанной записи, поэтому глубина страницы не влияет
+    на стоимость запроса и ``COUNT(*)`` не нужен. Ключ ``ordering``
+    должен быть уникальным, поэтому последним полем идёт ``pk``.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 transform=None, **kwargs):
+        self.ordering = tuple(ordering)
+        self.transform = transform
+        super().__init__(object_list, per_page, **kwargs)
+
+    def _check_object_list_is_ordered(self):
+        """Порядок задаётся самим паджинатором."""
+
+    def encode_cursor(self, obj, direction):
+        values = [self._value(obj, name) for name in self._names()]
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return urlsafe_base64_encode(payload.encode())
+
+    def decode_cursor(self, token):
+        try:
+            direction, values = json.loads(
+                force_str(urlsafe_base64_decode(token)))
+            if direction not in (FORWARD, BACKWARD):
+                raise ValueError(direction)
+            if len(values) != len(self.ordering):
+                raise ValueError(values)
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self._names(), values)
+            ]
+        except Exception as error:
+            raise InvalidCursor(token) from error
+        return direction, values
+
+    def cursor_page(self, token=None):
+        """Страница после/до курсора ``token``; без курсора — первая."""
+        direction, values = FORWARD, None
+        if token:
+            direction, values = self.decode_cursor(token)
+        forward = direction == FORWARD
+        rows = self._fetch(values, forward, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or not forward:
+                next_cursor = self.encode_cursor(rows[-1], FORWARD)
+            if values is not None and (has_more or forward):
+                previous_cursor = self.encode_cursor(rows[0], BACKWARD)
+        if self.transform is not None:
+            rows = [self.transform(row) for row in rows]
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def get_cursor_page(self, token=None):
+        """Как ``cursor_page``, но при битом курсоре отдаёт первую страницу."""
+        try:
+            return self.cursor_page(token)
+        except InvalidCursor:
+            return self.cursor_page()
+
+    def _fetch(self, values, forward, limit):
+        return self.seek(self.object_list, self.ordering, values, forward,
+                         limit)
+
+    @staticmethod
+    def seek(queryset, ordering, values, forward, limit):
+        """Первые ``limit`` записей ``queryset`` после ключа ``values``.
+
+        При ``forward=False`` записи идут в обратном порядке, начиная
+        с ближайшей к ключу.
+        """
+        if not forward:
+            ordering = [
+                name[1:] if name.startswith('-') else '-' + name
+                for name in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(seek_condition(ordering, values))
+        return list(queryset[:limit])
+
+    def _value(self, obj, name):
+        """Значение поля ключа у записи: модели или словаря ``.values()``."""
+        if isinstance(obj, dict):
+            if name == 'pk':
+                return obj['pk']
+            field = self._field(name)
+            obj = SimpleNamespace(**{field.attname: obj[name]})
+        elif name == 'pk':
+            return obj.pk
+        return self._field(name).value_to_string(obj)
+
+    def _names(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _field(self, name):
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+
+def seek_condition(ordering, values):
+    """Условие «строго после ключа» для составной сортировки ``ordering``.
+
+    Нестрогая граница по первому полю дублирует условие, но позволяет
+    базе начать чтение индекса сразу с ключа, а не с начала ленты.
+    """
+    first = ordering[0]
+    lookup = 'lte' if first.startswith('-') else 'gte'
+    bound = Q(**{f'{first.lstrip("-")}__{lookup}': values[0]})
+    condition = Q()
+    for index, name in enumerate(ordering):
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        step = Q(**{f'{name.lstrip("-")}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return bound & condition
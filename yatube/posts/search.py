@@ -0,0 +1,170 @@
+"""Полнотекстовый поиск по постам.
+
+В SQLite посты индексируются виртуальной таблицей FTS5
+``posts_post_fts`` с внешним содержимым, в PostgreSQL — GIN-индексом
+по ``to_tsvector('russian', text)``; оба обновляются самой базой при
+записи в ``posts_post``. Результаты упорядочены по релевантности
+(``score``: меньше — лучше) и листаются курсором по ``(score, pk)``,
+поэтому стоимость страницы зависит от числа совпадений, а не от
+числа постов. На других базах поиск откатывается на ``icontains``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+
+from .models import Post
+from .paginator import CursorPaginator
+
+SQLITE_TRIGGERS = {
+    'posts_post_fts_insert': (
+        'CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert '
+        'AFTER INSERT ON posts_post BEGIN '
+        'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+        'END'),
+    'posts_post_fts_delete': (
+        'CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete '
+        'AFTER DELETE ON posts_post BEGIN '
+        'INSERT INTO posts_post_fts(posts_post_fts, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        'END'),
+    'posts_post_fts_update': (
+        'CREATE TRIGGER IF NOT EXISTS posts_post_fts_update '
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        'INSERT INTO posts_post_fts(posts_post_fts, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+        'END'),
+}
+POSTGRESQL_VECTOR = "to_tsvector('russian', posts_post.text)"
+POSTGRESQL_QUERY = "plainto_tsquery('russian', %s)"
+
+
+def ensure_index():
+    """Восстанавливает таблицу и триггеры индекса, если их нет.
+
+    SQLite пересоздаёт ``posts_post`` при изменении её полей в
+    миграциях, и триггеры пропадают вместе со старой таблицей.
+    Возвращает ``True``, если индекс пришлось перестроить.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name IN "
+            "('posts_post', 'posts_post_fts')")
+        existing = {row[0] for row in cursor.fetchall()}
+        # Без таблицы индекса миграция поиска ещё не применена
+        if ('posts_post_fts' not in existing
+                or set(SQLITE_TRIGGERS) <= existing):
+            return False
+        for sql in SQLITE_TRIGGERS.values():
+            cursor.execute(sql)
+    rebuild()
+    return True
+
+
+def rebuild():
+    """Перестраивает индекс по текущим постам."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) "
+                "VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute('REINDEX INDEX posts_post_text_search')
+
+
+def match_expression(query):
+    """Запрос FTS5 из слов пользователя: все слова, каждое в кавычках.
+
+    Синтаксис FTS5 (``OR``, ``NEAR``, ``*``) пользователю недоступен,
+    зато любой ввод — корректный запрос.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join('"{}"'.format(word) for word in words)
+
+
+def _sqlite_matches(query, values, forward, limit):
+    condition, params = '', [match_expression(query)]
+    if values is not None:
+        sign = '>' if forward else '<'
+        condition = (
+            f'AND (rank {sign} %s OR (rank = %s AND rowid {sign} %s))')
+        params += [values[0], values[0], values[1]]
+    direction = '' if forward else ' DESC'
+    sql = (
+        'SELECT rowid, rank FROM posts_post_fts '
+        f'WHERE posts_post_fts MATCH %s {condition} '
+        f'ORDER BY rank{direction}, rowid{direction} LIMIT %s')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return cursor.fetchall()
+
+
+def _postgresql_matches(query, values, forward, limit):
+    # ts_rank тем больше, чем лучше совпадение, score — наоборот
+    score = f'-ts_rank({POSTGRESQL_VECTOR}, {POSTGRESQL_QUERY})'
+    condition, params = '', [query]
+    if values is not None:
+        sign = '>' if forward else '<'
+        condition = f'AND ({score}, id) {sign} (%s, %s)'
+        params += [query, values[0], values[1]]
+    direction = '' if forward else ' DESC'
+    sql = (
+        f'SELECT id, {score} AS score FROM posts_post '
+        f'WHERE {POSTGRESQL_VECTOR} @@ {POSTGRESQL_QUERY} {condition} '
+        f'ORDER BY score{direction}, id{direction} LIMIT %s')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [query] + params + [limit])
+        return cursor.fetchall()
+
+
+def _fallback_matches(query, values, forward, limit):
+    words = re.findall(r'\w+', query)
+    posts = Post.objects.all()
+    for word in words:
+        posts = posts.filter(text__icontains=word)
+    if values is not None:
+        posts = posts.filter(
+            Q(pk__gt=values[1]) if forward else Q(pk__lt=values[1]))
+    ordering = 'pk' if forward else '-pk'
+    return [(pk, 0.0) for pk in posts.order_by(ordering).values_list(
+        'pk', flat=True)[:limit]]
+
+
+MATCHERS = {
+    'sqlite': _sqlite_matches,
+    'postgresql': _postgresql_matches,
+}
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорные страницы результатов поиска ``query``.
+
+    У каждого поста страницы есть атрибут ``score``.
+    """
+
+    def __init__(self, query, per_page, **kwargs):
+        self.query = query
+        self.score_field = FloatField(name='score')
+        self.score_field.set_attributes_from_name('score')
+        super().__init__(
+            Post.objects.select_related('author', 'group'), per_page,
+            ordering=('score', 'pk'), **kwargs)
+
+    def _field(self, name):
+        return self.score_field if name == 'score' else Post._meta.pk
+
+    def _fetch(self, values, forward, limit):
+        if not match_expression(self.query):
+            return []
+        matcher = MATCHERS.get(connection.vendor, _fallback_matches)
+        matches = matcher(self.query, values, forward, limit)
+        posts = self.object_list.in_bulk([pk for pk, _ in matches])
+        found = []
+        for pk, score in matches:
+            if pk in posts:
+                posts[pk].score = score
+                found.append(posts[pk])
+        return found
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_save,
+)
+from django.dispatch import receiver
+
+from core.tasks import enqueue
+
+from . import cache, counters, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, UserStats
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    # Строка нужна и пользователям из loaddata: без неё падают профиль
+    # и страница поста
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    # Новая версия сбрасывает закэшированную карточку поста
+    if not instance._state.adding and not raw:
+        instance.version += 1
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        instance.group.update(version=F('version') + 1)
+        authors = instance.group.values_list('author_id', flat=True)
+        cache.bump_feeds(['index', f'group:{instance.pk}'] + [
+            f'author:{pk}' for pk in authors.distinct().order_by()])
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    loaded_group_id = getattr(instance, '_loaded_group_id', None)
+    with transaction.atomic():
+        if created:
+            counters.bump_user(instance.author_id, posts_count=1)
+            counters.bump_group(instance.group_id, 1)
+            cache.bump_feeds(cache.feed_scopes(instance))
+        elif (hasattr(instance, '_loaded_group_id')
+              and loaded_group_id != instance.group_id):
+            counters.bump_group(loaded_group_id, -1)
+            counters.bump_group(instance.group_id, 1)
+            cache.bump_feeds(cache.feed_scopes(
+                instance, [loaded_group_id, instance.group_id]))
+        else:
+            # Правка меняет страницы лент, где показана карточка поста
+            cache.bump_feeds(cache.feed_scopes(instance))
+    instance._loaded_group_id = instance.group_id
+    if created:
+        enqueue(timeline.post_published, instance.pk,
+                key=f'timeline:fan_out:{instance.pk}')
+    thumbnails.schedule(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    with transaction.atomic():
+        counters.bump_user(instance.author_id, posts_count=-1)
+        counters.bump_group(instance.group_id, -1)
+    cache.bump_feeds(cache.feed_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        with transaction.atomic():
+            counters.bump_user(instance.user_id, following_count=1)
+            counters.bump_user(instance.author_id, followers_count=1)
+        enqueue(timeline.follow_changed, instance.user_id,
+                instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    with transaction.atomic():
+        counters.bump_user(instance.user_id, following_count=-1)
+        counters.bump_user(instance.author_id, followers_count=-1)
+    enqueue(timeline.follow_changed, instance.user_id, instance.author_id)
+
+
+@receiver(post_migrate)
+def search_index_checked(sender, **kwargs):
+    if sender.name == 'posts':
+        search.ensure_index()
@@ -0,0 +1,16 @@
+from django import template
+from django.conf import settings
+
+from .. import paginator
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page):
+    """Номера страниц вокруг текущей, ``None`` — пропуск.
+
+    ``{% page_window page_obj as pages %}``
+    """
+    return paginator.page_window(page, settings.PAGINATOR_WINDOW,
+                                 settings.PAGINATOR_OFFSET_PAGES)
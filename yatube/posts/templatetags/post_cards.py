@@ -0,0 +1,30 @@
+from django import template
+from django.templatetags.static import static
+
+from core import metrics
+
+from ..cache import render_cards
+from ..thumbnails import stored_urls
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Карточки постов ленты из кэша фрагментов.
+
+    ``{% post_cards page_obj as cards %}`` кладёт в контекст список
+    готовых HTML-фрагментов в порядке постов.
+    """
+    return render_cards(posts, context.get('group'))
+
+
+@register.simple_tag
+def post_thumbnail(post, size):
+    """Адрес готовой миниатюры или заглушки, пока она строится."""
+    with metrics.timer('thumbnails'):
+        url = stored_urls(post).get(size)
+    if url:
+        return url
+    metrics.count('thumbnails_pending')
+    return static('img/thumbnail-placeholder.svg')
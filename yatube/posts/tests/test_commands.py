@@ -0,0 +1,159 @@
+import json
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from core.models import Task
+
+from .. import benchmark
+from ..management.commands.check_query_plans import full_scans, sorts
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CheckQueryPlansTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не читают таблицы целиком."""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('index', out.getvalue())
+
+    def test_full_scan_detected(self):
+        """Полный просмотр таблицы находится в плане SQLite."""
+        plan = ('2 0 0 SCAN posts_post\n'
+                '3 0 0 SCAN posts_group USING INDEX posts_group_slug')
+        self.assertEqual(list(full_scans(plan, 'sqlite')), ['posts_post'])
+
+    def test_sort_detected(self):
+        """Сортировка во временной таблице находится в плане SQLite."""
+        self.assertTrue(sorts('7 0 0 USE TEMP B-TREE FOR ORDER BY', 'sqlite'))
+        self.assertFalse(sorts(
+            '2 0 0 SEARCH posts_timelineentry USING INDEX '
+            'posts_timeline_user_pub (user_id=?)', 'sqlite'))
+
+
+class RecountTest(TestCase):
+    def test_recount_repairs_counters(self):
+        """recount восстанавливает разъехавшиеся счётчики."""
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.create(text='Пост', author=author, group=group)
+        UserStats.objects.filter(user=author).update(posts_count=5)
+        Group.objects.filter(pk=group.pk).update(posts_count=0)
+        call_command('recount', stdout=StringIO())
+        author.stats.refresh_from_db()
+        group.refresh_from_db()
+        self.assertEqual(author.stats.posts_count, 1)
+        self.assertEqual(group.posts_count, 1)
+
+
+class TransferTest(TestCase):
+    def test_export_import_round_trip(self):
+        """Выгрузка загружается обратно со счётчиками и лентами."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        Comment.objects.create(text='Комментарий', author=reader, post=post)
+        Follow.objects.create(user=reader, author=author)
+        for file_format in ('jsonl', 'csv'):
+            with self.subTest(file_format=file_format):
+                dump = StringIO()
+                with mock.patch('sys.stdout', dump):
+                    call_command('export_posts', format=file_format,
+                                 stderr=StringIO())
+                pub_date = Post.objects.get().pub_date
+                Post.objects.all().delete()
+                Follow.objects.all().delete()
+                dump.seek(0)
+                with mock.patch('sys.stdin', dump):
+                    call_command('import_posts', format=file_format,
+                                 batch_size=2, stdout=StringIO())
+                imported = Post.objects.get()
+                self.assertEqual(imported.pub_date, pub_date)
+                self.assertEqual(imported.group, group)
+                self.assertEqual(imported.comments_count, 1)
+                self.assertEqual(
+                    UserStats.objects.get(user=author).posts_count, 1)
+                self.assertEqual(list(reader.timeline.values_list(
+                    'post_id', flat=True)), [imported.pk])
+
+    @override_settings(TASKS_SYNC=False)
+    def test_import_into_non_empty_database(self):
+        """В непустой базе id сдвигаются, созданные авторы комментариев
+        получают счётчики, картинкам ставятся миниатюры."""
+        author = User.objects.create_user(username='author')
+        existing = Post.objects.create(text='Старый пост', author=author)
+        rows = [
+            {'type': 'post', 'id': existing.pk, 'author': 'author',
+             'text': 'Новый пост', 'image': 'posts/imported.gif',
+             'pub_date': '2022-01-01T00:00:00+00:00'},
+            {'type': 'comment', 'id': 1, 'post': existing.pk,
+             'author': 'ghost', 'text': 'Комментарий',
+             'pub_date': '2022-01-02T00:00:00+00:00'},
+        ]
+        dump = StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+        with mock.patch('sys.stdin', dump):
+            call_command('import_posts', create_missing=True,
+                         stdout=StringIO())
+        existing.refresh_from_db()
+        self.assertEqual(existing.text, 'Старый пост')
+        imported = Post.objects.get(text='Новый пост')
+        self.assertNotEqual(imported.pk, existing.pk)
+        self.assertEqual(imported.comments.get().author.username, 'ghost')
+        ghost = User.objects.get(username='ghost')
+        self.assertEqual(UserStats.objects.get(user=ghost).posts_count, 0)
+        self.assertEqual(
+            Task.objects.get(name='posts.thumbnails.generate').args,
+            json.dumps([imported.pk, 'posts/imported.gif']))
+
+    def test_comment_to_unknown_post_fails(self):
+        """Комментарий к посту не из выгрузки — ошибка, а не чужой пост."""
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+        row = ('{"type": "comment", "id": 1, "post": 1, "author": "author", '
+               '"text": "t", "pub_date": "2022-01-01T00:00:00+00:00"}\n')
+        with mock.patch('sys.stdin', StringIO(row)):
+            with self.assertRaises(CommandError):
+                call_command('import_posts', stdout=StringIO())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_import_unknown_author_fails(self):
+        """Без --create-missing неизвестный автор — ошибка."""
+        row = ('{"type": "post", "id": 1, "author": "ghost", '
+               '"text": "t", "pub_date": "2022-01-01T00:00:00+00:00"}\n')
+        with mock.patch('sys.stdin', StringIO(row)):
+            with self.assertRaises(CommandError):
+                call_command('import_posts', stdout=StringIO())
+            self.assertFalse(Post.objects.exists())
+
+
+class BenchmarkTest(TestCase):
+    def test_measure_all_views(self):
+        """Замер на синтетических данных покрывает все страницы постов."""
+        benchmark.seed(200, users=20, groups=3, follows_per_user=5)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertTrue(Follow.objects.exists())
+        results = benchmark.measure(repeat=2)
+        self.assertEqual(set(results), {
+            'index', 'index_deep', 'group_posts', 'profile', 'post_detail',
+            'follow_index'})
+        for view in results.values():
+            self.assertGreater(view['cold_queries'], 0)
+            self.assertGreater(view['p95_ms'], 0)
+
+    def test_compare_finds_regressions(self):
+        """Рост числа запросов и заметный рост p95 — регрессии."""
+        view = {'cold_queries': 3, 'queries': 1, 'p95_ms': 10.0,
+                'peak_kb': 100.0}
+        baseline = {'runs': [{'posts': 10, 'views': {'index': view}}]}
+        current = {'runs': [{'posts': 10, 'views': {'index': dict(
+            view, queries=2, p95_ms=11.0)}}]}
+        self.assertEqual(benchmark.compare(baseline, current),
+                         [(10, 'index', 'queries', 1, 2)])
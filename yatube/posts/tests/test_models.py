@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -53,3 +53,54 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     task._meta.get_field(value).help_text, expected)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other', description='Описание')
+
+    def assertCounters(self, posts, group_posts, other_group_posts):
+        self.author.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, posts)
+        self.assertEqual(self.group.posts_count, group_posts)
+        self.assertEqual(self.other_group.posts_count, other_group_posts)
+
+    def test_post_counters(self):
+        """Счётчики постов меняются при создании, переносе и удалении."""
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group)
+        self.assertCounters(1, 1, 0)
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(1, 0, 1)
+        post.delete()
+        self.assertCounters(0, 0, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Счётчики комментариев и подписок меняются вместе с записями."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(
+            text='Комментарий', author=self.reader, post=post)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0)
@@ -1,13 +1,26 @@
+import json
 import shutil
 import tempfile
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 from django.core.cache import cache
-from ..models import Group, Post, Comment, Follow
+from core import metrics
+from core.models import Task
+from core.tasks import run_pending
+from ..models import Group, Post, Comment, Follow, TimelineEntry, UserStats
 from .test_forms import gif_create
+from ..counting import estimate_count
+from ..paginator import CursorPaginator, EstimatedPaginator, page_window
+from ..cache import card_stats, feed_stats
+from ..counters import recount_groups, recount_users
+from ..thumbnails import generate, stored_urls
+from ..timeline import TimelinePaginator
 MEDIA_ROOT = tempfile.mkdtemp()
 User = get_user_model()
 
@@ -106,6 +119,26 @@ class TaskViewTests(TestCase):
         self.assertEqual(response.context['post'].group, self.group)
         self.assertEqual(response.context['comments'][0].text, self.comment.text)
 
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_post_detail_comments_scoped_and_paged(self):
+        """На post_detail только комментарии поста, постранично."""
+        other_post = Post.objects.create(text='other', author=self.user)
+        Comment.objects.create(text='чужой', author=self.user,
+                               post=other_post)
+        for number in range(2):
+            Comment.objects.create(text=f'comment{number}',
+                                   author=self.user, post=self.post)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        comments = self.guest_client.get(url).context['comments']
+        self.assertEqual([comment.text for comment in comments],
+                         ['test_comment', 'comment0'])
+        response = self.guest_client.get(
+            url, {'comments': comments.next_cursor})
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['comment1'])
+        self.assertNotContains(response, 'чужой')
+
     def post_check(self, response):
         post = response.context['page_obj'][0]
         self.assertEqual(post.id, self.post.pk)
@@ -168,17 +201,19 @@ class TaskViewTests(TestCase):
         self.assertEqual(correct_post, self.post)
 
     def test_cache_index(self):
-        """Проверка очищения кэша на index."""
+        """Страница index берётся из кэша и сбрасывается новым постом."""
+        cache.clear()
         response = self.guest_client.get(reverse('posts:index')).content
+        cached = self.guest_client.get(reverse('posts:index')).content
+        self.assertEqual(response, cached)
+        self.assertEqual(feed_stats()['hits'], 1)
         Post.objects.create(
             text='test_new_post',
             author=self.author,
         )
-        no_cache = self.guest_client.get(reverse('posts:index')).content
-        self.assertEqual(response, no_cache, 'Количество постов отличается')
-        cache.clear()
-        cached = self.guest_client.get(reverse('posts:index')).content
-        self.assertNotEqual(response, cached, 'Количество постов одинаково')
+        fresh = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(fresh, 'test_new_post')
+        self.assertEqual(fresh.context['page_obj'][0].text, 'test_new_post')
 
     def test_follow(self):
         self.authorized_user_client.get(
@@ -230,6 +265,9 @@ class PaginatorViewsTest(TestCase):
             for post in range(13)
         ]
         Post.objects.bulk_create(posts)
+        # bulk_create не шлёт сигналы, счётчики пересчитываются вручную
+        recount_users()
+        recount_groups()
 
     def test_first_page_contains_ten_records(self):
         cache.clear()
@@ -241,3 +279,592 @@ class PaginatorViewsTest(TestCase):
         response = self.client.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_cached_page_keeps_navigation(self):
+        """Страница из кэша ленты совпадает со свежей."""
+        cache.clear()
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        fresh = self.client.get(url, {'page': 2}).context['page_obj']
+        cached = self.client.get(url, {'page': 2}).context['page_obj']
+        self.assertEqual(feed_stats()['hits'], 1)
+        self.assertEqual(list(cached), list(fresh))
+        self.assertEqual(cached.number, 2)
+        self.assertEqual(cached.paginator.num_pages, 2)
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсорные страницы проходят ленту без пропусков и повторов."""
+        response = self.client.get(reverse('posts:groups',
+                                           kwargs={'slug': self.group.slug}))
+        first = response.context['page_obj']
+        self.assertIsNone(first.next_cursor)
+        paginator = CursorPaginator(
+            Post.objects.filter(group=self.group), settings.MAX_POSTS)
+        first = paginator.cursor_page()
+        second = paginator.cursor_page(first.next_cursor)
+        response = self.client.get(
+            reverse('posts:groups', kwargs={'slug': self.group.slug}),
+            {'cursor': first.next_cursor})
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.is_cursor)
+        self.assertEqual(list(page_obj), list(second))
+        self.assertEqual(len(page_obj), 3)
+        self.assertFalse(page_obj.has_next())
+        ids = [post.pk for post in first] + [post.pk for post in page_obj]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-pk')
+                      .values_list('pk', flat=True)))
+        back = paginator.cursor_page(page_obj.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Повреждённый курсор отдаёт первую страницу."""
+        response = self.client.get(reverse('posts:groups',
+                                           kwargs={'slug': self.group.slug}),
+                                   {'cursor': 'broken'})
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.MAX_POSTS)
+
+    @override_settings(PAGINATOR_OFFSET_PAGES=1)
+    def test_deep_offset_page_links_to_cursor(self):
+        """После PAGINATOR_OFFSET_PAGES «Следующая» ведёт на курсор."""
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertIsNotNone(page_obj.next_cursor)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+
+    @override_settings(MAX_POSTS=1, PAGINATOR_WINDOW=1,
+                       PAGINATOR_OFFSET_PAGES=3)
+    def test_deep_numbered_pages_not_served(self):
+        """Номера глубже PAGINATOR_OFFSET_PAGES не читаются через OFFSET
+        и не показываются в навигации."""
+        cache.clear()
+        url = reverse('posts:index')
+        self.assertEqual(self.client.get(url, {'page': 4}).status_code, 404)
+        response = self.client.get(url, {'page': 3})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_window(page_obj, 1, 3), [1, 2, 3, None])
+        self.assertNotContains(response, '?page=4"')
+        self.assertNotContains(
+            response, f'?page={page_obj.paginator.num_pages}"')
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+
+    @override_settings(MAX_POSTS=1, PAGINATOR_WINDOW=1,
+                       PAGINATOR_OFFSET_PAGES=100)
+    def test_page_window(self):
+        """Навигация показывает окно вокруг текущей страницы."""
+        cache.clear()
+        response = self.client.get(reverse('posts:index'), {'page': 6})
+        self.assertEqual(
+            page_window(response.context['page_obj'], 1),
+            [1, None, 5, 6, 7, None, 13])
+        self.assertContains(response, '?page=7"')
+        self.assertNotContains(response, '?page=9"')
+        self.assertContains(response, '?page=13"')
+
+    @override_settings(MAX_POSTS=5, PAGINATOR_COUNT_FREE=True)
+    def test_count_free_pages(self):
+        """Без подсчёта записей лента листается до конца без COUNT(*)."""
+        cache.clear()
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(url).context['page_obj']
+        self.assertFalse(any('COUNT' in query['sql']
+                             for query in queries.captured_queries))
+        self.assertIsNone(first.paginator.num_pages)
+        self.assertEqual(page_window(first, 2), [1, 2, None])
+        last = self.client.get(url, {'page': 3}).context['page_obj']
+        self.assertEqual(len(last), 3)
+        self.assertFalse(last.has_next())
+        self.assertEqual(page_window(last, 2), [1, 2, 3])
+        cached = self.client.get(url, {'page': 3}).context['page_obj']
+        self.assertFalse(cached.has_next())
+        self.assertEqual(list(cached), list(last))
+        self.assertEqual(len(self.client.get(
+            url, {'page': 9}).context['page_obj']), 5)
+
+
+@override_settings(PAGINATOR_EXACT_COUNT_LIMIT=5)
+class EstimatedCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='estimated', description='Описание')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.author, group=cls.group)
+            for number in range(13))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_feeds_are_counted_exactly(self):
+        """Ленты не длиннее предела считаются точно."""
+        with override_settings(PAGINATOR_EXACT_COUNT_LIMIT=100):
+            self.assertEqual(estimate_count(Post.objects.all()), (13, False))
+
+    def test_table_statistics(self):
+        """Лента без фильтров оценивается по статистике базы."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with self.assertNumQueries(2):
+            self.assertEqual(estimate_count(Post.objects.all()), (13, True))
+
+    def test_filtered_count_is_cached(self):
+        """Точный подсчёт ленты с фильтром кэшируется."""
+        posts = Post.objects.filter(group=self.group)
+        self.assertEqual(estimate_count(posts), (13, True))
+        with self.assertNumQueries(1):
+            self.assertEqual(estimate_count(posts), (13, True))
+
+    def test_overestimate_is_corrected(self):
+        """Пустая страница из-за завышенной оценки ведёт на последнюю."""
+        posts = Post.objects.filter(group=self.group).order_by('pk')
+        estimate_count(posts)
+        Post.objects.filter(pk__in=list(
+            posts.values_list('pk', flat=True)[:5])).delete()
+        paginator = EstimatedPaginator(posts, 5)
+        self.assertEqual(paginator.num_pages, 3)
+        page = paginator.get_page(3)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(paginator.count, 8)
+
+
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(text='old', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow_feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def follow(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+
+    def test_timeline_follows_subscriptions(self):
+        """Лента подписок заполняется при подписке, публикации
+        и очищается при отписке."""
+        self.follow()
+        self.assertEqual(self.follow_feed(), ['old'])
+        Post.objects.create(text='new', author=self.author)
+        self.assertEqual(self.reader.timeline.count(), 2)
+        self.assertEqual(self.follow_feed(), ['new', 'old'])
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(self.follow_feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        self.follow()
+        Post.objects.create(text='new', author=self.author)
+        self.assertFalse(self.reader.timeline.exists())
+        self.assertEqual(self.follow_feed(), ['new', 'old'])
+        paginator = TimelinePaginator(self.reader, 1)
+        first = paginator.cursor_page()
+        second = paginator.cursor_page(first.next_cursor)
+        self.assertEqual([post.text for post in first], ['new'])
+        self.assertEqual([post.text for post in second], ['old'])
+
+    @override_settings(PAGINATOR_EXACT_COUNT_LIMIT=1)
+    def test_numbered_pages_estimate_count(self):
+        """Число записей ленты подписок оценивается, как у других лент:
+        точный подсчёт большой ленты берётся из кэша."""
+        cache.clear()
+        self.follow()
+        Post.objects.create(text='new', author=self.author)
+        url = reverse('posts:follow_index')
+        paginator = self.reader_client.get(url).context['page_obj'].paginator
+        self.assertEqual((paginator.count, paginator.estimated), (2, True))
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        exact = [query for query in queries.captured_queries
+                 if 'COUNT(*)' in query['sql']
+                 and 'LIMIT' not in query['sql']]
+        self.assertEqual(exact, [])
+
+    def test_celebrities_read_once(self):
+        """Подписки на авторов без раскладки читаются один раз на запрос."""
+        self.follow()
+        with CaptureQueriesContext(connection) as queries:
+            self.follow_feed()
+        celebrity_queries = [
+            query for query in queries.captured_queries
+            if 'FROM "posts_follow"' in query['sql']
+            and 'followers_count' in query['sql']]
+        self.assertEqual(len(celebrity_queries), 1)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_numbered_pages_merge_celebrity_posts(self):
+        """Нумерованные страницы ленты подписок идут по записям ленты
+        вместе с постами популярного автора."""
+        celebrity = User.objects.create_user(username='celebrity')
+        self.follow()
+        TimelineEntry.objects.create(
+            user=self.reader, post=self.old_post,
+            pub_date=self.old_post.pub_date)
+        Follow.objects.create(user=self.reader, author=celebrity)
+        for number in range(settings.MAX_POSTS + 2):
+            Post.objects.create(text=f'Пост {number}', author=celebrity)
+        response = self.reader_client.get(
+            reverse('posts:follow_index') + '?page=2')
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, settings.MAX_POSTS + 3)
+        self.assertEqual([post.text for post in page],
+                         ['Пост 1', 'Пост 0', 'old'])
+
+
+class CardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Исходный текст', author=self.author, group=self.group)
+        self.url = reverse('posts:groups', kwargs={'slug': self.group.slug})
+
+    def test_cards_are_served_from_cache(self):
+        """Повторный показ ленты берёт карточки из кэша."""
+        self.client.get(self.url)
+        self.assertEqual(card_stats()['misses'], 1)
+        self.client.get(self.url)
+        self.assertEqual(card_stats()['hits'], 1)
+
+    def test_edit_invalidates_card(self):
+        """Правка поста и переименование группы сбрасывают карточку."""
+        self.client.get(self.url)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Новый текст')
+        version = Post.objects.get(pk=self.post.pk).version
+        self.group.title = 'Новая группа'
+        self.group.save()
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).version, version + 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, TASKS_SYNC=False)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def test_card_shows_placeholder_until_thumbnail_ready(self):
+        """Карточка показывает заглушку, пока миниатюра не построена."""
+        cache.clear()
+        post = Post.objects.create(
+            text='С картинкой', author=self.author, image=gif_create())
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'thumbnail-placeholder.svg')
+        self.assertEqual(generate(post.pk, post.image.name), 1)
+        post.refresh_from_db()
+        url = stored_urls(post)['card']
+        self.assertContains(self.client.get(reverse('posts:index')), url)
+
+    def test_thumbnails_are_built_by_queued_task(self):
+        """Миниатюры строит задача из очереди, повторное сохранение не
+        ставит её второй раз."""
+        cache.clear()
+        post = Post.objects.create(
+            text='С картинкой', author=self.author, image=gif_create())
+        post.save()
+        self.assertEqual(Task.objects.filter(
+            name='posts.thumbnails.generate').count(), 1)
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'thumbnail-placeholder.svg')
+        run_pending()
+        post.refresh_from_db()
+        url = stored_urls(post)['card']
+        self.assertContains(self.client.get(reverse('posts:index')), url)
+
+
+class MissingStatsTest(TestCase):
+    def test_pages_of_user_without_stats_row(self):
+        """Профиль и пост автора без строки UserStats открываются,
+        строка создаётся пересчётом."""
+        author = User.objects.create_user(username='nostats')
+        post = Post.objects.create(text='Пост без счётчиков', author=author)
+        UserStats.objects.filter(user=author).delete()
+        cache.clear()
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'nostats'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['post_count'], 1)
+        UserStats.objects.filter(user=author).delete()
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UserStats.objects.get(user=author).posts_count, 1)
+
+
+class ProfileQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        for number in range(30):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=group)
+        cls.url = reverse('posts:profile', kwargs={'username': 'author'})
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Автор, подписка и страница постов читаются за два запроса."""
+        for per_page in (5, 25):
+            with self.subTest(per_page=per_page), override_settings(
+                    MAX_POSTS=per_page):
+                cache.clear()
+                with self.assertNumQueries(2):
+                    response = self.client.get(self.url)
+                self.assertEqual(len(response.context['page_obj']), per_page)
+                cache.clear()
+                # Плюс сессия и пользователь запроса
+                with self.assertNumQueries(4):
+                    response = self.reader_client.get(self.url)
+                self.assertFalse(response.context['following'])
+
+    def test_following_flag(self):
+        """Признак подписки приходит тем же запросом, что и автор."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(self.url)
+        self.assertTrue(response.context['following'])
+
+
+class PostDetailQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=group)
+        for number in range(30):
+            commenter = User.objects.create_user(username=f'reader{number}')
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'Комментарий {number}')
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def test_query_count_does_not_depend_on_comments(self):
+        """Пост, автор, группа, счётчик и комментарии — за два запроса."""
+        author_client = Client()
+        author_client.force_login(self.author)
+        for per_page in (5, 25):
+            with self.subTest(per_page=per_page), override_settings(
+                    COMMENTS_PER_PAGE=per_page):
+                cache.clear()
+                with self.assertNumQueries(2):
+                    response = self.client.get(self.url)
+                self.assertEqual(len(response.context['comments']), per_page)
+                self.assertContains(response, 'Имя Фамилия')
+                self.assertEqual(response.context['post_count'], 1)
+                # Плюс сессия и пользователь запроса
+                with self.assertNumQueries(4):
+                    author_client.get(self.url)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        for text in ('Кошка спит на диване', 'Собака и кошка дружат',
+                     'Кошка, кошка, кошка!', 'Просто текст'):
+            Post.objects.create(text=text, author=cls.author)
+        cls.url = reverse('posts:search')
+
+    def search(self, query, per_page=10, cursor=None):
+        params = {'q': query}
+        if cursor:
+            params['cursor'] = cursor
+        with override_settings(MAX_POSTS=per_page):
+            return self.client.get(self.url, params).context['page_obj']
+
+    def test_results_ranked_by_relevance(self):
+        """Находятся только совпадения, самое релевантное — первым."""
+        texts = [post.text for post in self.search('кошка')]
+        self.assertEqual(len(texts), 3)
+        self.assertEqual(texts[0], 'Кошка, кошка, кошка!')
+        self.assertNotIn('Просто текст', texts)
+
+    def test_cursor_pages_cover_results(self):
+        """Курсорные страницы проходят выдачу без повторов."""
+        first = self.search('кошка', per_page=2)
+        second = self.search('кошка', per_page=2, cursor=first.next_cursor)
+        self.assertEqual(len(first) + len(second), 3)
+        self.assertFalse(set(first) & set(second))
+        self.assertFalse(second.has_next())
+
+    def test_index_follows_edits_and_deletes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.get(text='Просто текст')
+        post.text = 'Теперь про кошку и кошка'
+        post.save()
+        self.assertEqual(len(self.search('кошка')), 4)
+        post.delete()
+        self.assertEqual(len(self.search('кошка')), 3)
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Операторы FTS в запросе не ломают поиск."""
+        self.assertEqual(len(self.search('" OR * NEAR(')), 0)
+        self.assertIsNone(self.client.get(self.url).context['page_obj'])
+
+
+class FeedViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feed-group', description='Описание')
+        Post.objects.create(text='Первый <пост>', author=cls.author)
+        cls.post = Post.objects.create(
+            text='Второй пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_formats(self):
+        """Ленты отдаются потоком в RSS, Atom и JSON."""
+        urls = [reverse('posts:index_feed'),
+                reverse('posts:group_feed', args=[self.group.slug]),
+                reverse('posts:profile_feed', args=[self.author.username])]
+        for url in urls:
+            with self.subTest(url=url):
+                rss = self.client.get(url)
+                self.assertTrue(rss.streaming)
+                self.assertIn('<rss version="2.0">', self.content(rss))
+                atom = self.content(self.client.get(url, {'format': 'atom'}))
+                self.assertIn('<entry>', atom)
+                data = json.loads(self.content(
+                    self.client.get(url, {'format': 'json'})))
+                self.assertEqual(data['items'][0]['content_text'],
+                                 'Второй пост')
+        index = self.content(self.client.get(reverse('posts:index_feed')))
+        self.assertIn('Первый &lt;пост&gt;', index)
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без чтения постов."""
+        url = reverse('posts:index_feed')
+        response = self.client.get(url)
+        self.assertEqual(response['Last-Modified'],
+                         http_date(self.post.pub_date.timestamp()))
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        Post.objects.create(text='Третий пост', author=self.author)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='conditional', description='Описание')
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revisit(self, url, client=None):
+        client = client or self.client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    @override_settings(FEED_VALIDATORS=False, FEED_CACHE_SCOPES=())
+    def test_feed_validators_off_without_shared_cache(self):
+        """Без общих поколений ленты отдаются целиком, а страница поста
+        сохраняет ETag из версии поста."""
+        for url in (reverse('posts:index'), reverse('posts:index_feed'),
+                    reverse('posts:groups', args=[self.group.slug])):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='"x"')
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('ETag'))
+        response = self.revisit(reverse('posts:post_detail',
+                                        args=[self.post.pk]))
+        self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизменившиеся страницы отвечают 304 без рендеринга."""
+        urls = [reverse('posts:index'),
+                reverse('posts:groups', args=[self.group.slug]),
+                reverse('posts:profile', args=[self.author.username]),
+                reverse('posts:post_detail', args=[self.post.pk])]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revisit(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertIsNone(response.context)
+        etag = self.client.get(reverse('posts:index'))['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('posts:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        saved = metrics.snapshot()['posts:index']
+        self.assertEqual(saved['not_modified']['sum'], 2)
+        self.assertGreater(saved['bytes_saved']['sum'], 0)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост, правка и комментарий меняют ETag страниц."""
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', args=[self.post.pk])
+        etags = {url: self.client.get(url)['ETag'] for url in (index, detail)}
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        for url, etag in etags.items():
+            self.assertEqual(self.client.get(
+                url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(detail)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        self.assertEqual(self.client.get(
+            detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_user_and_page(self):
+        """ETag различается для пользователей, страниц и подписки."""
+        url = reverse('posts:profile', args=[self.author.username])
+        anonymous = self.client.get(url)['ETag']
+        reader = self.reader_client.get(url)['ETag']
+        self.assertNotEqual(anonymous, reader)
+        self.assertNotEqual(
+            self.client.get(url, {'page': 2})['ETag'], anonymous)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.reader_client.get(
+            url, HTTP_IF_NONE_MATCH=reader).status_code, 200)
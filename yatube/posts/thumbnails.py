@@ -0,0 +1,53 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+После сохранения поста с картинкой задача ``generate`` строит все
+размеры из ``THUMBNAIL_SIZES`` в воркерах ``run_workers`` и пишет их
+адреса в ``Post.thumbnails``. Шаблон только читает готовые адреса и,
+пока их нет, показывает заглушку: декодирование и масштабирование
+картинки больше не происходят внутри запроса.
+"""
+import json
+
+from django.conf import settings
+from django.db.models import F
+from sorl.thumbnail import get_thumbnail
+
+from core import metrics
+from core.tasks import enqueue, task
+
+from . import cache
+from .models import Post
+
+
+def stored_urls(post):
+    """Готовые адреса миниатюр текущей картинки поста."""
+    if not post.image or not post.thumbnails:
+        return {}
+    urls = json.loads(post.thumbnails)
+    if urls.pop('image', None) != post.image.name:
+        return {}
+    return urls
+
+
+def schedule(post):
+    """Ставит построение миниатюр текущей картинки поста в очередь."""
+    if not post.image or stored_urls(post):
+        return
+    metrics.count('thumbnails_scheduled')
+    enqueue(generate, post.pk, post.image.name,
+            key=f'thumbnails:{post.pk}:{post.image.name}')
+
+
+@task()
+def generate(post_id, image_name):
+    """Строит все размеры миниатюр и сохраняет их адреса в посте."""
+    urls = {'image': image_name}
+    for size, (geometry, options) in settings.THUMBNAIL_SIZES.items():
+        urls[size] = get_thumbnail(image_name, geometry, **options).url
+    # Новая версия сбрасывает закэшированную карточку с заглушкой
+    updated = Post.objects.filter(pk=post_id, image=image_name).update(
+        thumbnails=json.dumps(urls), version=F('version') + 1)
+    if updated:
+        post = Post.objects.only('author_id', 'group_id').get(pk=post_id)
+        cache.bump_feeds(cache.feed_scopes(post))
+    return updated
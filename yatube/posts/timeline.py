@@ -0,0 +1,233 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост автора сразу раскладывается в ``TimelineEntry`` всех его
+подписчиков, и лента ``follow_index`` читается одним диапазоном по
+индексу ``(user, pub_date, post)``. У авторов с числом подписчиков
+больше ``TIMELINE_FANOUT_LIMIT`` раскладка не делается: их посты
+подмешиваются в ленту при чтении (fan-out on read).
+"""
+from django.conf import settings
+from django.db import connection
+
+from core.tasks import task
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginator import CursorPaginator
+
+
+def followers_count(author_id):
+    return UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first() or 0
+
+
+def is_celebrity(author_id):
+    return followers_count(author_id) > settings.TIMELINE_FANOUT_LIMIT
+
+
+def celebrities_followed(user):
+    """id авторов из подписок ``user``, чьи посты читаются без раскладки."""
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту ``user_id`` все посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты ``user_id`` после отписки.
+
+    Если автор опустился до порога раскладки, его посты больше не
+    подмешиваются при чтении, поэтому ленты оставшихся подписчиков
+    дозаполняются. Одна задача может обработать несколько отписок сразу,
+    и число подписчиков перескакивает порог, поэтому дозаполнение идёт
+    при любом числе не больше порога: записи, которые уже есть,
+    пропускаются.
+    """
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+    if not is_celebrity(author_id):
+        followers = Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True)
+        for follower_id in followers:
+            backfill(follower_id, author_id)
+
+
+@task()
+def post_published(post_id):
+    """Задача: раскладывает новый пост, если его ещё не удалили."""
+    post = Post.objects.filter(pk=post_id).only(
+        'author_id', 'pub_date').first()
+    if post is not None:
+        fan_out(post)
+
+
+@task()
+def follow_changed(user_id, author_id):
+    """Задача: приводит ленту ``user_id`` к текущей подписке на автора.
+
+    Задачи подписки и отписки подряд могут выполниться в любом порядке,
+    поэтому решает состояние подписки на момент выполнения, а не событие.
+    """
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        backfill(user_id, author_id)
+    else:
+        prune(user_id, author_id)
+
+
+def rebuild(author_ids):
+    """Дозаполняет ленты подписчиков авторов, например после импорта.
+
+    Записи вставляются одним ``INSERT ... SELECT`` по соединению подписок
+    и постов, без выборки строк в Python.
+    """
+    author_ids = list(author_ids)
+    if not author_ids:
+        return
+    authors = UserStats.objects.filter(
+        user_id__in=author_ids,
+        followers_count__lte=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True)
+    rows, params = Follow.objects.filter(author_id__in=authors).values_list(
+        'user_id', 'author__posts__pk', 'author__posts__pub_date',
+    ).exclude(author__posts__pk=None).query.sql_with_params()
+    opts = TimelineEntry._meta
+    columns = ', '.join(
+        connection.ops.quote_name(opts.get_field(name).column)
+        for name in ('user', 'post', 'pub_date'))
+    sql = '{insert} {table} ({columns}) {rows} {suffix}'.format(
+        insert=connection.ops.insert_statement(ignore_conflicts=True),
+        table=connection.ops.quote_name(opts.db_table),
+        columns=columns,
+        rows=rows,
+        suffix=connection.ops.ignore_conflicts_suffix_sql(
+            ignore_conflicts=True),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+class TimelinePosts:
+    """Посты ленты подписок для постраничного режима.
+
+    Срез страницы читается диапазоном индекса ``(user, pub_date, post)``
+    записей ``TimelineEntry``, без списка id и сортировки во временной
+    таблице. Посты авторов без раскладки читаются тем же срезом по
+    индексу постов автора и сливаются с записями по ``(pub_date, pk)``.
+    Порядок ленты фиксирован, ``order_by`` его не меняет.
+    """
+    ordered = True
+
+    def __init__(self, user, celebrities=None):
+        if celebrities is None:
+            celebrities = celebrities_followed(user)
+        self.celebrities = list(celebrities)
+        self.entries = TimelineEntry.objects.filter(user=user).order_by(
+            '-pub_date', '-post_id')
+
+    def order_by(self, *fields):
+        return self
+
+    def querysets(self):
+        """Запросы источников ленты: ``EstimatedPaginator`` оценивает
+        каждый, как обычную ленту."""
+        if not self.celebrities:
+            return [self.entries]
+        # Записи, разложенные до того, как автор перешёл порог, уже
+        # посчитаны среди его постов
+        return [
+            self.entries.exclude(post__author_id__in=self.celebrities),
+            Post.objects.filter(author_id__in=self.celebrities),
+        ]
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Лента подписок читается только срезами')
+        start, stop = index.start or 0, index.stop
+        entries = self.entries.select_related('post__author', 'post__group')
+        if not self.celebrities:
+            return [entry.post for entry in entries[start:stop]]
+        # Оба источника читаются с начала до конца страницы: глубина
+        # ограничена PAGINATOR_OFFSET_PAGES, дальше лента идёт курсором
+        posts = [entry.post for entry in entries[:stop]]
+        posts += Post.objects.filter(
+            author_id__in=self.celebrities).select_related(
+            'author', 'group').order_by('-pub_date', '-pk')[:stop]
+        unique = {post.pk: post for post in posts}.values()
+        return sorted(unique, key=lambda post: (post.pub_date, post.pk),
+                      reverse=True)[start:stop]
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорная лента подписок: материализованные записи плюс посты
+    авторов, которые читаются без раскладки.
+
+    Ключ курсора — ``(pub_date, pk)`` поста, общий для обоих источников.
+    Список ``celebrities`` передаётся, если он уже получен для той же
+    ленты.
+    """
+
+    def __init__(self, user, per_page, celebrities=None, **kwargs):
+        if celebrities is None:
+            celebrities = celebrities_followed(user)
+        self.celebrities = list(celebrities)
+        entries = TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group')
+        super().__init__(entries, per_page, **kwargs)
+
+    def _field(self, name):
+        return Post._meta.pk if name == 'pk' else Post._meta.get_field(name)
+
+    def _fetch(self, values, forward, limit):
+        posts = [
+            entry.post for entry in self.seek(
+                self.object_list, ('-pub_date', '-post_id'),
+                values, forward, limit)
+        ]
+        if not self.celebrities:
+            return posts
+        posts += self.seek(
+            Post.objects.filter(author_id__in=self.celebrities)
+            .select_related('author', 'group'),
+            self.ordering, values, forward, limit)
+        unique = {post.pk: post for post in posts}.values()
+        return sorted(
+            unique, key=lambda post: (post.pub_date, post.pk),
+            reverse=forward)[:limit]
@@ -0,0 +1,271 @@
+"""Потоковый экспорт и пакетный импорт постов, комментариев и подписок.
+
+Строка выгрузки — словарь с полем ``type`` (``post``, ``comment``,
+``follow``); авторы и группы записываются по ``username`` и ``slug``.
+Импорт вставляет строки через ``bulk_create`` пачками. В пустую базу
+посты и комментарии попадают со своими id; в непустой id сдвигаются за
+наибольший существующий, а ссылки комментариев на посты выгрузки
+пересчитываются.
+"""
+import csv
+import json
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User
+
+FIELDS = ('type', 'id', 'author', 'group', 'post', 'user', 'text',
+          'pub_date', 'image')
+
+
+def export_rows(chunk_size):
+    """Строки выгрузки; запросы читаются курсором по ``chunk_size``."""
+    posts = Post.objects.order_by('pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date',
+        'image')
+    for pk, author, group, text, pub_date, image in posts.iterator(
+            chunk_size=chunk_size):
+        yield {'type': 'post', 'id': pk, 'author': author, 'group': group,
+               'text': text, 'pub_date': pub_date.isoformat(),
+               'image': image or None}
+    comments = Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'author__username', 'text', 'pub_date')
+    for pk, post, author, text, pub_date in comments.iterator(
+            chunk_size=chunk_size):
+        yield {'type': 'comment', 'id': pk, 'post': post, 'author': author,
+               'text': text, 'pub_date': pub_date.isoformat()}
+    follows = Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username')
+    for user, author in follows.iterator(chunk_size=chunk_size):
+        yield {'type': 'follow', 'user': user, 'author': author}
+
+
+def write_jsonl(rows, stream):
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        yield row
+
+
+def write_csv(rows, stream):
+    writer = csv.DictWriter(stream, FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield row
+
+
+def read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        yield {name: value for name, value in row.items() if value != ''}
+
+
+WRITERS = {'jsonl': write_jsonl, 'csv': write_csv}
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def keep_pub_dates():
+    """Отключает ``auto_now_add``, чтобы сохранить даты из выгрузки."""
+    fields = [model._meta.get_field('pub_date') for model in (Post, Comment)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Импорт строк выгрузки пачками по ``batch_size``.
+
+    Авторы и группы ищутся через словари в памяти, которые
+    дополняются одним запросом на пачку. ``bulk_create`` не отправляет
+    сигналы, поэтому счётчики, ленты подписок и кэш лент обновляются
+    один раз после импорта.
+    """
+
+    def __init__(self, batch_size, create_missing=False):
+        self.batch_size = batch_size
+        self.create_missing = create_missing
+        self.users = {}
+        self.groups = {}
+        self.imported = {'post': 0, 'comment': 0, 'follow': 0}
+        self.authors = set()
+        self.users_touched = set()
+        self.users_created = set()
+        # id поста в выгрузке -> id в базе
+        self.post_ids = {}
+        self.post_offset = self.comment_offset = 0
+        self.posts_commented = set()
+        self.elapsed = 0.0
+
+    def run(self, rows, progress=None):
+        started = time.monotonic()
+        self.post_offset = self.id_offset(Post)
+        self.comment_offset = self.id_offset(Comment)
+        with keep_pub_dates():
+            for chunk in chunked(rows, self.batch_size):
+                with transaction.atomic():
+                    self.import_chunk(chunk)
+                if progress is not None:
+                    progress(self)
+        self.finish()
+        self.elapsed = time.monotonic() - started
+        return self.imported
+
+    @staticmethod
+    def id_offset(model):
+        """Сдвиг id выгрузки: наибольший id в таблице или 0."""
+        return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    @property
+    def total(self):
+        return sum(self.imported.values())
+
+    def throughput(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def import_chunk(self, chunk):
+        self.resolve_users(
+            {row[name] for row in chunk for name in ('author', 'user')
+             if row.get(name)})
+        self.resolve_groups(
+            {row['group'] for row in chunk if row.get('group')})
+        by_type = {'post': [], 'comment': [], 'follow': []}
+        for row in chunk:
+            by_type[row['type']].append(row)
+        posts = [self.post(row) for row in by_type['post']]
+        self.insert(Post, posts)
+        for post in posts:
+            # Задача миниатюр видна воркерам после коммита пачки
+            thumbnails.schedule(post)
+        self.insert(
+            Comment, [self.comment(row) for row in by_type['comment']])
+        self.insert(Follow, [self.follow(row) for row in by_type['follow']],
+                    ignore_conflicts=True)
+        for kind, kind_rows in by_type.items():
+            self.imported[kind] += len(kind_rows)
+
+    def insert(self, model, objs, **kwargs):
+        # Django 2.2 не ограничивает явный batch_size лимитами базы
+        # (у SQLite — число параметров запроса)
+        batch_size = min(self.batch_size, connection.ops.bulk_batch_size(
+            model._meta.concrete_fields, objs) or self.batch_size)
+        model.objects.bulk_create(objs, batch_size=batch_size, **kwargs)
+
+    def resolve_users(self, usernames):
+        missing = usernames - self.users.keys()
+        if not missing:
+            return
+        self.users.update(User.objects.filter(
+            username__in=missing).values_list('username', 'pk'))
+        missing -= self.users.keys()
+        if missing and self.create_missing:
+            User.objects.bulk_create(
+                User(username=name, password=make_password(None))
+                for name in missing)
+            created = dict(User.objects.filter(
+                username__in=missing).values_list('username', 'pk'))
+            self.users.update(created)
+            self.users_created.update(created.values())
+            missing -= self.users.keys()
+        if missing:
+            raise LookupError(
+                f'Нет пользователей: {", ".join(sorted(missing))}')
+
+    def resolve_groups(self, slugs):
+        missing = slugs - self.groups.keys()
+        if not missing:
+            return
+        self.groups.update(Group.objects.filter(
+            slug__in=missing).values_list('slug', 'pk'))
+        missing -= self.groups.keys()
+        if missing and self.create_missing:
+            Group.objects.bulk_create(
+                Group(title=slug, slug=slug, description='')
+                for slug in missing)
+            self.groups.update(Group.objects.filter(
+                slug__in=missing).values_list('slug', 'pk'))
+            missing -= self.groups.keys()
+        if missing:
+            raise LookupError(f'Нет групп: {", ".join(sorted(missing))}')
+
+    def post(self, row):
+        author_id = self.users[row['author']]
+        self.authors.add(author_id)
+        pk = int(row['id']) + self.post_offset
+        self.post_ids[int(row['id'])] = pk
+        return Post(
+            pk=pk,
+            author_id=author_id,
+            group_id=self.groups.get(row.get('group')),
+            text=row['text'],
+            pub_date=parse_datetime(row['pub_date']),
+            image=row.get('image') or '',
+        )
+
+    def comment(self, row):
+        post_id = self.post_ids.get(int(row['post']))
+        if post_id is None:
+            raise LookupError(
+                f'Комментарий {row["id"]} к посту {row["post"]}, '
+                f'которого нет в выгрузке до него')
+        self.posts_commented.add(post_id)
+        return Comment(
+            pk=int(row['id']) + self.comment_offset,
+            post_id=post_id,
+            author_id=self.users[row['author']],
+            text=row['text'],
+            pub_date=parse_datetime(row['pub_date']),
+        )
+
+    def follow(self, row):
+        author_id = self.users[row['author']]
+        user_id = self.users[row['user']]
+        self.authors.add(author_id)
+        self.users_touched.add(user_id)
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def finish(self):
+        # Явные id не двигают последовательности PostgreSQL
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        # Созданным пользователям (в том числе только авторам
+        # комментариев) нужна строка UserStats
+        counters.recount_users(User.objects.filter(
+            pk__in=self.authors | self.users_touched | self.users_created))
+        counters.recount_groups(Group.objects.filter(
+            pk__in=self.groups.values()))
+        counters.recount_posts(Post.objects.filter(
+            pk__in=self.posts_commented))
+        timeline.rebuild(self.authors)
+        cache.bump_feeds(['index'] + [
+            f'author:{pk}' for pk in self.authors] + [
+            f'group:{pk}' for pk in self.groups.values()])
@@ -6,13 +6,18 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('feed/', views.index_feed, name='index_feed'),
     path('create/', views.post_create, name='post_create'),
     path('group/<slug:slug>/', views.group_posts, name='groups'),
+    path('group/<slug:slug>/feed/', views.group_feed, name='group_feed'),
     path('posts/<int:pk>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/feed/', views.profile_feed,
+         name='profile_feed'),
     path('posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
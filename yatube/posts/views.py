@@ -1,67 +1,151 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.urls import reverse
+from core.db.writer import write
+from .cache import cached_feed_page
+from .conditional import feed_validators, render_conditional
+from .counters import user_stats
+from .feeds import Feed
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Comment, Follow
+from .models import Group, Post, User, Follow
+from .loaders import load_author, load_post, load_post_detail, load_profile
+from .paginator import (
+    FORWARD, CountedPaginator, CursorPaginator, EstimatedPaginator,
+    UncountedPaginator,
+)
+from .search import SearchPaginator
+from .timeline import (
+    TimelinePaginator, TimelinePosts, celebrities_followed,
+)
+
+
+def paginate_queryset(post_list, request, cursor_paginator=None,
+                      count=None):
+    """Страница ленты: по курсору (``?cursor=``) или по номеру (``?page=``).
+
+    Номера страниц оставлены для неглубоких страниц и шаблона
+    ``includes/paginator.html``; начиная с ``PAGINATOR_OFFSET_PAGES``
+    ссылка «Следующая» ведёт на курсор, и дальше лента листается
+    без ``OFFSET``; номера глубже отвечают 404. ``cursor_paginator``
+    заменяет курсорный режим для лент, которые читаются не из
+    ``post_list``. Известное заранее ``count`` избавляет от
+    ``COUNT(*)``; без него число записей больших лент оценивается,
+    а при ``PAGINATOR_COUNT_FREE`` записи не считаются вовсе.
+    """
+    if cursor_paginator is None:
+        cursor_paginator = CursorPaginator(post_list, settings.MAX_POSTS)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return cursor_paginator.get_cursor_page(cursor)
+    number = request.GET.get('page', '')
+    if number.isdigit() and int(number) > settings.PAGINATOR_OFFSET_PAGES:
+        raise Http404('Глубокие страницы ленты доступны только по курсору')
+    post_list = post_list.order_by(*cursor_paginator.ordering)
+    if count is not None:
+        paginator = CountedPaginator(post_list, settings.MAX_POSTS, count)
+    elif settings.PAGINATOR_COUNT_FREE:
+        paginator = UncountedPaginator(post_list, settings.MAX_POSTS)
+    else:
+        paginator = EstimatedPaginator(post_list, settings.MAX_POSTS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.next_cursor = None
+    if (page_obj.number >= settings.PAGINATOR_OFFSET_PAGES
+            and page_obj.has_next()):
+        page_obj.next_cursor = cursor_paginator.encode_cursor(
+            page_obj[len(page_obj) - 1], FORWARD)
+    return page_obj
 
 
-def paginate_queryset(post_list, request):
-    paginator = Paginator(post_list, settings.MAX_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def paginate_comments(comment_list, request):
+    """Страница комментариев по курсору ``?comments=``.
+
+    Комментарии идут от старых к новым, на странице не больше
+    ``COMMENTS_PER_PAGE`` записей.
+    """
+    paginator = CursorPaginator(
+        comment_list,
+        settings.COMMENTS_PER_PAGE,
+        ordering=('pub_date', 'pk'),
+    )
+    return paginator.get_cursor_page(request.GET.get('comments'))
+
+
+def paginate_feed(scope, post_list, request, count=None):
+    """``paginate_queryset`` через кэш страниц ленты ``scope``."""
+    return cached_feed_page(
+        scope, post_list, request,
+        lambda: paginate_queryset(post_list, request, count=count))
 
 
-@cache_page(20)
 def index(request):
     post_list = Post.objects.select_related('author', 'group')
-    context = {
-        'page_obj': paginate_queryset(post_list, request),
-    }
-    return render(request, 'posts/index.html', context)
+    return render_conditional(
+        request, 'posts/index.html',
+        lambda: {'page_obj': paginate_feed('index', post_list, request)},
+        *feed_validators('index'))
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.group.select_related('author')
-    context = {
-        'group': group,
-        'page_obj': paginate_queryset(post_list, request),
-    }
-    return render(request, 'posts/group_list.html', context)
+    scope = f'group:{group.pk}'
+    return render_conditional(
+        request, 'posts/group_list.html',
+        lambda: {
+            'group': group,
+            'page_obj': paginate_feed(
+                scope, post_list, request, group.posts_count),
+        },
+        *feed_validators(scope))
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    user = User.objects.get(username=username)
-    post_list = user.posts.select_related('group')
-    post_count = post_list.count()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author).exists()
-    context = {
-        'post_count': post_count,
-        'author': user,
-        'page_obj': paginate_queryset(post_list, request),
-        'following': following,
-    }
-    return render(request, 'posts/profile.html', context)
+    author = load_author(request, username)
+    return render_conditional(
+        request, 'posts/profile.html',
+        lambda: load_profile(
+            author,
+            lambda scope, post_list, count: paginate_feed(
+                scope, post_list, request, count)),
+        *feed_validators(f'author:{author.pk}', author.is_followed))
+
+
+def index_feed(request):
+    return Feed(request, 'index', 'Последние обновления на сайте',
+                reverse('posts:index'), Post.objects.all()).response()
+
+
+def group_feed(request, slug):
+    group = get_object_or_404(Group.objects.only('pk', 'slug', 'title'),
+                              slug=slug)
+    return Feed(request, f'group:{group.pk}', f'Записи сообщества {group}',
+                reverse('posts:groups', args=[slug]),
+                group.group.all()).response()
+
+
+def profile_feed(request, username):
+    author = get_object_or_404(User.objects.only('pk', 'username'),
+                               username=username)
+    return Feed(request, f'author:{author.pk}', f'Записи {username}',
+                reverse('posts:profile', args=[username]),
+                author.posts.all()).response()
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    post_count = post.author.posts.count()
-    form = CommentForm(request.POST or None)
-    comments = Comment.objects.select_related('post')
-    context = {
-        'post': post,
-        'post_count': post_count,
-        'form': form,
-        'is_edit': True,
-        'comments': comments,
-    }
-    return render(request, 'posts/post_detail.html', context)
+    post = load_post(post_id)
+
+    def get_context():
+        context = load_post_detail(
+            post, lambda comment_list: paginate_comments(
+                comment_list, request))
+        context.update(form=CommentForm(request.POST or None), is_edit=True)
+        return context
+    return render_conditional(
+        request, 'posts/post_detail.html', get_context,
+        (post.pk, post.version, post.comments_count,
+         user_stats(post.author).posts_count))
 
 
 @login_required
@@ -72,7 +156,7 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -103,13 +187,29 @@ def post_edit(request, pk):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    celebrities = list(celebrities_followed(request.user))
     context = {
-        'page_obj': paginate_queryset(post_list, request)
+        'page_obj': paginate_queryset(
+            TimelinePosts(request.user, celebrities), request,
+            TimelinePaginator(request.user, settings.MAX_POSTS,
+                              celebrities=celebrities)),
     }
     return render(request, 'posts/follow.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = SearchPaginator(query, settings.MAX_POSTS)
+        page_obj = paginator.get_cursor_page(request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
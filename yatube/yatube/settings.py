@@ -24,6 +24,47 @@ SECRET_KEY = 'u_x^w01w+r+48+-7mbiuie^+&f8inmpy4o2wvwk_anyzte6z-e'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 MAX_POSTS = 10
+# Дальше этой страницы лента листается по курсору, без OFFSET
+PAGINATOR_OFFSET_PAGES = 10
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGINATOR_WINDOW = 2
+# Не считать записи лент без счётчика: номер последней страницы
+# не показывается, зато не нужен COUNT(*) по большой таблице
+PAGINATOR_COUNT_FREE = False
+# Ленты длиннее этого считаются приблизительно: по статистике базы
+# или точным подсчётом, который кэшируется на COUNT_CACHE_TIMEOUT
+PAGINATOR_EXACT_COUNT_LIMIT = 1000
+COUNT_CACHE_TIMEOUT = 60 * 5
+COMMENTS_PER_PAGE = 20
+# Посты авторов с большим числом подписчиков не раскладываются
+# по лентам подписок, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BATCH_SIZE = 500
+# Сколько живёт отрендеренная карточка поста
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Ленты, страницы которых кэшируются до следующей записи в них
+FEED_CACHE_SCOPES = ('index', 'group', 'author')
+FEED_CACHE_TIMEOUT = 60 * 60
+# ETag и Last-Modified лент из их поколений в кэше (posts.conditional).
+# И кэш страниц, и валидаторы верны, только если кэш общий для всех
+# процессов, которые пишут в базу, — см. settings_production
+FEED_VALIDATORS = True
+# Сколько последних постов отдают ленты RSS, Atom и JSON
+FEED_ITEMS = 20
+# Размер страницы API по умолчанию и наибольший для ?limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Размеры миниатюр, которые строятся в фоне после сохранения поста
+THUMBNAIL_SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Границы корзин гистограмм времени запросов (мс) и как часто
+# процесс складывает накопленные гистограммы в общий кэш (с)
+METRICS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+METRICS_FLUSH_INTERVAL = 10
+# Сколько живёт в кэше опубликованное состояние пула соединений
+# процесса (с): запись процесса, который перестал её обновлять, истекает
+DB_POOL_STATS_TIMEOUT = 60
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 ALLOWED_HOSTS = [
@@ -43,10 +84,13 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
+    'notifications.apps.NotificationsConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +98,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -61,7 +106,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Учитывает время рендеринга в метриках запроса
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         # Добавлено: Искать шаблоны на уровне проекта
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
@@ -84,10 +130,92 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
+# Режим конкурентной записи SQLite (YATUBE_SQLITE_CONCURRENCY=1): WAL,
+# прагмы на каждом соединении и очередь записи комментариев
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    # Кэш страниц 64 МБ (отрицательное значение — в килобайтах)
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+SQLITE_CONCURRENCY = os.environ.get('YATUBE_SQLITE_CONCURRENCY') == '1'
+if SQLITE_CONCURRENCY:
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': 20,
+        'pragmas': SQLITE_PRAGMAS,
+    }
+WRITER_QUEUE = SQLITE_CONCURRENCY
+WRITER_QUEUE_BATCH_SIZE = 50
+WRITER_QUEUE_DELAY = 0.005
+WRITER_QUEUE_TIMEOUT = 10
+# Фоновые задачи после записи (core.tasks). В синхронном режиме
+# (YATUBE_TASKS_SYNC, по умолчанию и в тестах) задача выполняется сразу
+# при постановке, иначе её выполняют процессы manage.py run_workers
+TASKS_SYNC = os.environ.get('YATUBE_TASKS_SYNC', '1') == '1'
+TASK_WORKERS = 2
+TASK_BATCH_SIZE = 10
+TASK_MAX_ATTEMPTS = 5
+# Пауза перед повтором (с), удваивается с каждой попыткой
+TASK_RETRY_DELAY = 10
+# Задача, которую воркер не завершил за это время, выполняется заново
+TASK_LOCK_TIMEOUT = 5 * 60
+TASK_POLL_INTERVAL = 1
+# Сколько дней хранить завершённые задачи (и ключи выполненных) и как
+# часто воркер удаляет старые (с)
+TASK_RETENTION_DAYS = 7
+TASK_PURGE_INTERVAL = 60 * 60
+# Дайджесты уведомлений: события копятся DIGEST_WINDOW секунд и уходят
+# одним письмом на получателя (не больше DIGEST_MAX_ITEMS событий в
+# письме). Письма отправляются через одно соединение пачками по
+# DIGEST_BATCH_SIZE, не быстрее DIGEST_RATE писем в секунду (0 — без
+# ограничения)
+DIGEST_WINDOW = 15 * 60
+DIGEST_BATCH_SIZE = 100
+DIGEST_RATE = 0
+DIGEST_MAX_ITEMS = 20
+# Адрес сайта для ссылок в письмах
+DIGEST_SITE_URL = os.environ.get('YATUBE_SITE_URL', 'http://localhost:8000')
+# Реплики только для чтения: YATUBE_DB_REPLICAS — пути к файлам SQLite
+# через запятую (например, копии db.sqlite3). В тестах они зеркалят default
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Представления, которые читают с реплик, и сколько секунд после записи
+# пользователь читает основную базу, чтобы видеть свои изменения
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:groups',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'posts:search',
+    'posts:index_feed',
+    'posts:group_feed',
+    'posts:profile_feed',
+    'api:posts',
+    'api:post',
+    'api:comments',
+    'api:groups',
+    'api:group_posts',
+    'api:profile_posts',
+    'api:follow_index',
+)
+REPLICA_STICKY_SECONDS = 10
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -134,8 +262,34 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
-CACHES = {
-    'default': {
+# Общий для всех воркеров кэш выбирается переменной YATUBE_CACHE:
+# locmem — свой кэш у каждого процесса (по умолчанию),
+# file — каталог на диске, db — таблица в базе (нужен createcachetable,
+# атомарный add для single flight), redis — сервер Redis
+# по YATUBE_CACHE_LOCATION (нужен django-redis)
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
\ No newline at end of file
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION', 'yatube_cache'),
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    },
+}
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
+}
+# Пересчитывает просроченный ключ один воркер, остальные тем временем
+# отдают старое значение (не дольше SINGLE_FLIGHT_STALE_TIMEOUT)
+SINGLE_FLIGHT_STALE_TIMEOUT = 60
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
@@ -0,0 +1,67 @@
+"""Настройки боевого окружения.
+
+Включаются переменной ``DJANGO_SETTINGS_MODULE=yatube.settings_production``,
+всё остальное задаётся переменными окружения ``YATUBE_*``.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES, SQLITE_PRAGMAS
+
+DEBUG = os.environ.get('YATUBE_DEBUG') == '1'
+SECRET_KEY = os.environ['YATUBE_SECRET_KEY']
+ALLOWED_HOSTS = os.environ.get('YATUBE_ALLOWED_HOSTS', 'localhost').split(',')
+# Побочные эффекты записи выполняют процессы manage.py run_workers
+TASKS_SYNC = os.environ.get('YATUBE_TASKS_SYNC') == '1'
+TASK_WORKERS = int(os.environ.get('YATUBE_TASK_WORKERS', 2))
+DIGEST_RATE = float(os.environ.get('YATUBE_DIGEST_RATE', 0))
+# Поколения лент живут в кэше. С locmem у каждого процесса (воркеры
+# gunicorn, run_workers, import_posts) свои поколения: запись в одном не
+# сбрасывает страницы и ETag остальных, и они отдают устаревшие ленты.
+# Без общего кэша (YATUBE_CACHE=redis, db или file) кэш страниц лент и
+# условные ответы по поколениям выключены
+if CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    FEED_CACHE_SCOPES = ()
+    FEED_VALIDATORS = False
+
+# База: YATUBE_DB_ENGINE — sqlite (по умолчанию), postgresql или
+# postgresql_pool (пул соединений в процессе, нужен psycopg2)
+DB_ENGINES = {
+    'sqlite': 'core.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+    'postgresql_pool': 'core.db.backends.postgresql_pool',
+}
+DB_ENGINE = os.environ.get('YATUBE_DB_ENGINE', 'sqlite')
+DATABASES['default'] = {
+    'ENGINE': DB_ENGINES[DB_ENGINE],
+    'NAME': os.environ.get('YATUBE_DB_NAME', DATABASES['default']['NAME']),
+    # Постоянные соединения: не открывать новое на каждый запрос.
+    # С пулом соединение возвращается в пул в конце запроса
+    'CONN_MAX_AGE': 0 if DB_ENGINE == 'postgresql_pool' else int(
+        os.environ.get('YATUBE_DB_CONN_MAX_AGE', 60)),
+}
+if DB_ENGINE == 'sqlite':
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': 20,
+        'pragmas': dict(SQLITE_PRAGMAS, busy_timeout=int(
+            os.environ.get('YATUBE_DB_BUSY_TIMEOUT', 5000))),
+    }
+    # Очередь записи упорядочивает запись только внутри процесса, а
+    # процессы gunicorn и run_workers всё равно ждут блокировку SQLite
+    # друг друга. Включается (YATUBE_WRITER_QUEUE=1) после замера под
+    # нагрузкой из нескольких процессов
+    WRITER_QUEUE = os.environ.get('YATUBE_WRITER_QUEUE') == '1'
+else:
+    DATABASES['default'].update({
+        'USER': os.environ.get('YATUBE_DB_USER', 'yatube'),
+        'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('YATUBE_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('YATUBE_DB_PORT', '5432'),
+    })
+    if DB_ENGINE == 'postgresql_pool':
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'max_size': int(os.environ.get('YATUBE_DB_POOL_SIZE', 10)),
+                'timeout': int(os.environ.get('YATUBE_DB_POOL_TIMEOUT', 5)),
+            },
+        }